@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# PYTHON_ARGCOMPLETE_OK
+
+"""benchmarks comparing the optimized code paths with the former implementations"""
+
+import numpy as np
+import scipy.spatial as spat
+
+import os
+import subprocess
+import sys
+import timeit
+
+import argparse, argcomplete
+
+
+def best_time(func, repeat):
+    """the best wall time of 'repeat' calls of 'func' in seconds"""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+###############################################################################
+# faces
+###############################################################################
+
+def get_single_faces_loop(triangulation):
+    """the former implementation of ays_tsm_show.get_single_faces, looping over the tetrahedrons"""
+    def get_faces(tetrahedron):
+        faces = np.zeros((4, 3))
+        for n, (i1, i2, i3) in enumerate([(0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)]):
+            faces[n] = tetrahedron[i1], tetrahedron[i2], tetrahedron[i3]
+        return faces
+
+    num_faces_single = 4
+    num_tetrahedrons = triangulation.shape[0]
+    num_faces = num_tetrahedrons * num_faces_single
+    faces = np.zeros((num_faces, 3), np.int_) # 3 is the dimension of the model
+    mask = np.ones((num_faces,), np.bool_)
+    for n in range(num_tetrahedrons):
+        faces[num_faces_single * n: num_faces_single * (n+1)] = get_faces(triangulation[n])
+    orderlist = ["x{}".format(i) for i in range(faces.shape[1])]
+    dtype_list = [(el, faces.dtype.str) for el in orderlist]
+    faces.view(dtype_list).sort(axis=0)
+    for k in range(num_faces-1):
+        if mask[k]:
+            if np.all(faces[k] == faces[k+1]):
+                mask[k] = False
+                mask[k+1] = False
+    single_faces = faces[mask]
+    return single_faces
+
+
+def region_triangulation(num):
+    """the Delaunay triangulation of a ball shaped region on a grid with 'num' points per dimension"""
+    x = np.linspace(0, 1, num)
+    grid = np.stack(np.meshgrid(x, x, x, indexing="ij"), axis=-1).reshape(-1, 3)
+    points = grid[np.linalg.norm(grid - 0.5, axis=-1) < 0.4]
+    # jitter a little bit so the triangulation is not degenerate
+    points = points + np.random.uniform(-1e-3, 1e-3, size=points.shape) / num
+    # sort the vertices of each simplex, the former implementation relies on it
+    return points, np.sort(spat.Delaunay(points).simplices, axis=1)
+
+
+def benchmark_faces(args):
+    import ays_tsm_show
+
+    points, simplices = region_triangulation(args.num)
+    print("{} points, {} tetrahedrons".format(len(points), len(simplices)))
+
+    new = ays_tsm_show.get_single_faces(simplices)
+    old = get_single_faces_loop(simplices)
+    same = set(map(tuple, new.tolist())) == set(map(tuple, old.tolist()))
+    print("{} boundary triangles, same set as the former implementation: {}".format(len(new), same))
+
+    t_new = best_time(lambda: ays_tsm_show.get_single_faces(simplices), args.repeat)
+    t_old = best_time(lambda: get_single_faces_loop(simplices), args.repeat)
+    print("former (loop): {:8.4f} s".format(t_old))
+    print("vectorized:    {:8.4f} s".format(t_new))
+    print("speedup:       {:8.1f}x".format(t_old / t_new))
+
+
+###############################################################################
+# startup
+###############################################################################
+
+STARTUP_MODULES = ["ays_general", "ays_model", "ays_export", "ays_reformat", "ays_tsm"]
+
+_STARTUP_SNIPPET = """
+import sys, time
+t = time.perf_counter()
+import {}
+print(time.perf_counter() - t, "matplotlib" in sys.modules)
+"""
+
+
+def import_time(modules, repeat):
+    """the best time (in a fresh interpreter) to import 'modules' and whether matplotlib got imported"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, "-c", _STARTUP_SNIPPET.format(", ".join(modules))],
+                                      cwd=cwd, universal_newlines=True)
+        t, mpl = out.split()[-2:]
+        results.append((float(t), mpl == "True"))
+    return min(results)
+
+
+def benchmark_startup(args):
+    # the plotting helpers used to be imported together with ays_general,
+    # so importing ays_plotting along with a module gives the former startup time
+    print("{:14s} {:>12s} {:>12s} {:>8s}  {}".format("module", "former", "lazy", "speedup", "imports matplotlib"))
+    for module in STARTUP_MODULES:
+        t_old, _ = import_time([module, "ays_plotting"], args.repeat)
+        t_new, mpl = import_time([module], args.repeat)
+        print("{:14s} {:10.3f} s {:10.3f} s {:7.1f}x  {}".format(module, t_old, t_new, t_old / t_new, mpl))
+
+
+###############################################################################
+# jacobian
+###############################################################################
+
+def edge_points(num, seed=0):
+    """initial conditions in the interior and close to the compactification edges s -> 1 and a -> 1"""
+    rs = np.random.RandomState(seed)
+    inner = rs.uniform(0.1, 0.9, size=(num, 3))
+    edge = 1 - 10**rs.uniform(-9, -3, size=num)
+    s_edge = np.array(inner)
+    s_edge[:, 2] = edge
+    a_edge = np.array(inner)
+    a_edge[:, 0] = edge
+    return {"interior": inner, "s -> 1": s_edge, "a -> 1": a_edge}
+
+
+def odeint_statistics(x0s, time, parameters, Dfun):
+    """integrate all 'x0s' with odeint, return the number of steps, rhs and Jacobian evaluations"""
+    import scipy.integrate as integ
+    import ays_model as ays
+
+    steps = rhs_calls = jacobian_calls = 0
+    for x0 in x0s:
+        _, info = integ.odeint(ays.AYS_rescaled_rhs, x0, time, args=parameters, Dfun=Dfun, full_output=True)
+        steps += info["nst"][-1]
+        rhs_calls += info["nfe"][-1]
+        jacobian_calls += info["nje"][-1]
+    return steps, rhs_calls, jacobian_calls
+
+
+def benchmark_jacobian(args):
+    import ays_model as ays
+
+    parameters = ays.get_management_parameters(ays.DEFAULT_NAME, ays.AYS_parameters, ays.grid_parameters)
+    time = np.linspace(0, 300, 1000)  # like in ays_show.py
+    offset, scaling_vector = np.zeros(3), np.eye(3)
+    runs = {"finite differences": ays.make_integration_run(parameters, offset, scaling_vector, jacobian=None),
+            "analytic": ays.make_integration_run(parameters, offset, scaling_vector)}
+    stepsize = 2 / ays.grid_parameters["n0"]  # like ays_tsm.stepsize for the default grid
+
+    # compile everything before measuring
+    odeint_statistics(np.full((1, 3), 0.5), time, parameters, ays.AYS_rescaled_jacobian)
+
+    print("{} trajectories per set, t in [0, {}]".format(args.num, time[-1]))
+    print("{:10s} {:20s} {:>8s} {:>10s} {:>10s} {:>10s} {:>12s}".format(
+        "set", "jacobian", "steps", "rhs calls", "jac calls", "odeint [s]", "run fn [s]"))
+    for name, x0s in edge_points(args.num).items():
+        for jacobian, Dfun in [("finite differences", None), ("analytic", ays.AYS_rescaled_jacobian)]:
+            steps, rhs_calls, jacobian_calls = odeint_statistics(x0s, time, parameters, Dfun)
+            t = best_time(lambda: odeint_statistics(x0s, time, parameters, Dfun), args.repeat)
+            # the run functions of 'ays_tsm.py -i', starting at the same points
+            t_run = best_time(lambda: [runs[jacobian](x0, stepsize) for x0 in x0s], args.repeat)
+            print("{:10s} {:20s} {:8d} {:10d} {:10d} {:10.4f} {:12.4f}".format(
+                name, jacobian, steps, rhs_calls, jacobian_calls, t, t_run))
+
+
+def benchmark_integration(args):
+    import pyviability as viab
+    import ays_model as ays
+
+    parameters = ays.get_management_parameters(ays.DEFAULT_NAME, ays.AYS_parameters, ays.grid_parameters)
+    offset, scaling_vector = np.zeros(3), np.eye(3)
+    stepsize = 2 / ays.grid_parameters["n0"]  # like ays_tsm.stepsize for the default grid
+    runs = {
+        "pyviability": viab.make_run_function(ays.AYS_rescaled_rhs, parameters, offset, scaling_vector,
+                                              returning="integration"),
+        "finite differences": ays.make_integration_run(parameters, offset, scaling_vector, jacobian=None),
+        "analytic": ays.make_integration_run(parameters, offset, scaling_vector),
+    }
+    # compile everything before measuring
+    for run in runs.values():
+        run(np.full(3, 0.5), stepsize)
+
+    # the run function of 'ays_tsm.py -i' before, the others are compared to it
+    print("{} points per set, stepsize {}, differences to the pyviability run function".format(args.num, stepsize))
+    print("{:10s} {:20s} {:>10s} {:>12s}".format("set", "run function", "time [s]", "max diff"))
+    for name, x0s in edge_points(args.num).items():
+        reference = np.array([runs["pyviability"](x0, stepsize) for x0 in x0s])
+        for run_name, run in runs.items():
+            t = best_time(lambda: [run(x0, stepsize) for x0 in x0s], args.repeat)
+            diff = np.max(np.abs(np.array([run(x0, stepsize) for x0 in x0s]) - reference))
+            print("{:10s} {:20s} {:10.4f} {:12.1e}".format(name, run_name, t, diff))
+
+
+###############################################################################
+# batch
+###############################################################################
+
+def benchmark_batch(args):
+    import ays_model as ays
+
+    parameters = ays.get_management_parameters(ays.DEFAULT_NAME, ays.AYS_parameters, ays.grid_parameters)
+    # the faces at 1 are infinity in the original coordinates
+    x = np.linspace(0, 1 - 1e-9, args.num)
+    points = np.stack(np.meshgrid(x, x, x, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    def point_by_point():
+        return np.array([ays.AYS_rescaled_rhs(point, 0., *parameters) for point in points])
+
+    batch = ays.AYS_rescaled_rhs_batch(points, 0., *parameters)
+    single = point_by_point()
+    print("{} points, max difference to AYS_rescaled_rhs: {:.1e}, same nan values: {}".format(
+        len(points), np.nanmax(np.abs(batch - single)), np.array_equal(np.isnan(batch), np.isnan(single))))
+    if not np.allclose(batch, single, rtol=0, atol=0, equal_nan=True):
+        sys.exit("AYS_rescaled_rhs_batch differs from AYS_rescaled_rhs")
+
+    t_single = best_time(point_by_point, args.repeat)
+    t_batch = best_time(lambda: ays.AYS_rescaled_rhs_batch(points, 0., *parameters), args.repeat)
+    print("point by point: {:8.4f} s".format(t_single))
+    print("batch:          {:8.4f} s".format(t_batch))
+    print("speedup:        {:8.1f}x".format(t_single / t_batch))
+
+
+###############################################################################
+# coordinates
+###############################################################################
+
+def benchmark_coordinates(args):
+    import scipy.integrate as integ
+    import ays_model as ays
+
+    parameters = ays.get_management_parameters(ays.DEFAULT_NAME, ays.AYS_parameters, ays.grid_parameters)
+    model_parameters, rescaling = parameters[:-3], parameters[-3:]
+    duration = 10.
+    rs = np.random.RandomState(0)
+    sets = {"interior": rs.uniform(0.05, 0.95, size=(args.num, 3))}
+    # W and S close to 0 or infinity, where the compactification squeezes the dynamics
+    edges = np.array(sets["interior"])
+    edges[:, 1:] = np.where(rs.uniform(size=(args.num, 2)) < 0.5, 1, 0) + \
+        np.where(rs.uniform(size=(args.num, 2)) < 0.5, 1, -1) * 10**rs.uniform(-4, -2, size=(args.num, 2))
+    sets["W, S edges"] = np.clip(edges, 1e-4, 1 - 1e-4)
+
+    def integrate(x0, coordinates, tol):
+        if coordinates == "compactified":
+            traj, info = integ.odeint(ays.AYS_rescaled_rhs, x0, [0, duration], args=parameters,
+                                      Dfun=ays.AYS_rescaled_jacobian, rtol=tol, atol=tol, full_output=True)
+            return traj[-1], info["nst"][-1]
+        traj, info = integ.odeint(ays.AYS_log_rhs, ays.to_log_coordinates(x0, *rescaling), [0, duration],
+                                  args=model_parameters, Dfun=ays.AYS_log_jacobian, rtol=tol, atol=tol, full_output=True)
+        return ays.from_log_coordinates(traj[-1], *rescaling), info["nst"][-1]
+
+    print("{} points per set, integrated for t = {}, errors in grid coordinates".format(args.num, duration))
+    print("{:12s} {:>10s} {:14s} {:>8s} {:>12s} {:>12s}".format("set", "tolerance", "coordinates", "steps", "95% error", "median error"))
+    for name, x0s in sets.items():
+        reference = [integ.odeint(ays.AYS_rescaled_rhs, x0, [0, duration], args=parameters, rtol=1e-12, atol=1e-14)[-1]
+                     for x0 in x0s]
+        for tol in [1e-4, 1e-6, 1e-8]:
+            for coordinates in ays.COORDINATES:
+                results = [integrate(x0, coordinates, tol) for x0 in x0s]
+                errors = np.max(np.abs(np.array([end for end, _ in results]) - reference), axis=-1)
+                print("{:12s} {:10.0e} {:14s} {:8d} {:12.1e} {:12.1e}".format(
+                    name, tol, coordinates, sum(steps for _, steps in results), np.percentile(errors, 95), np.median(errors)))
+
+
+###############################################################################
+# export
+###############################################################################
+
+def benchmark_export(args):
+    import io
+    import ays_export
+
+    rs = np.random.RandomState(0)
+    coordinates = rs.uniform(0, 1, size=(args.num**3, 3))
+    states = rs.randint(0, 14, size=args.num**3).astype(np.int16)
+
+    def savetxt(with_coordinates):
+        f = io.StringIO()
+        if with_coordinates:
+            np.savetxt(f, np.column_stack((coordinates, states)), fmt=["%.17g"] * 3 + ["%i"])
+        else:
+            np.savetxt(f, states, fmt="%i")
+        return f.getvalue()
+
+    def format_chunk(with_coordinates):
+        return ays_export.format_chunk(coordinates if with_coordinates else None, states)
+
+    print("{} points, a single chunk".format(len(states)))
+    for name, with_coordinates in [("states", False), ("coordinates", True)]:
+        if savetxt(with_coordinates) != format_chunk(with_coordinates):
+            sys.exit("ays_export.format_chunk differs from np.savetxt ({})".format(name))
+        t_savetxt = best_time(lambda: savetxt(with_coordinates), args.repeat)
+        t_chunk = best_time(lambda: format_chunk(with_coordinates), args.repeat)
+        print("{:12s} np.savetxt: {:8.4f} s, format_chunk: {:8.4f} s, speedup: {:5.1f}x".format(
+            name, t_savetxt, t_chunk, t_savetxt / t_chunk))
+
+
+###############################################################################
+# hybrid
+###############################################################################
+
+def benchmark_hybrid(args):
+    import ays_model as ays
+
+    parameters = ays.get_management_parameters(ays.DEFAULT_NAME, ays.AYS_parameters, ays.grid_parameters)
+    offset, scaling_vector = np.zeros(3), np.eye(3)
+    num_points = 2000
+    x0s = np.random.RandomState(0).uniform(0, 1, size=(num_points, 3))
+    stepsize = 2 / args.num  # like ays_tsm.stepsize with n0 = num
+
+    integration = ays.make_integration_run(parameters, offset, scaling_vector)
+    linear = ays.get_management_run(ays.DEFAULT_NAME, ays.AYS_parameters, ays.grid_parameters,
+                                    offset, scaling_vector, returning="linear")
+    reference = np.array([integration(x0, stepsize) for x0 in x0s])
+    # points next to the faces of the unit cube, with tolerance 1 Heun's step
+    # is always accurate enough, so only the bounds checks make it integrate
+    rs = np.random.RandomState(1)
+    boundary_x0s = rs.uniform(0, 1, size=(num_points, 3))
+    distances = 10**rs.uniform(-6, -2, size=num_points)
+    faces = rs.randint(0, 3, size=num_points)
+    boundary_x0s[np.arange(num_points), faces] = np.where(rs.uniform(size=num_points) < 0.5, distances, 1 - distances)
+    hybrid = ays.make_hybrid_run(parameters, offset, scaling_vector, tolerance=1.)
+    results = np.array([hybrid(x0, stepsize) for x0 in boundary_x0s])
+    # odeint itself may overshoot the faces by rounding errors
+    left = np.any((results < 0) | (results > 1), axis=-1)
+    outside = [not np.array_equal(result, integration(x0, stepsize))
+               for x0, result in zip(boundary_x0s[left], results[left])]
+    print("{} points next to the faces, left the unit cube without being integrated: {}".format(num_points, sum(outside)))
+    if any(outside):
+        sys.exit("ays_model.make_hybrid_run leaves the unit cube")
+    print()
+
+    print("{} random points, stepsize of 2 grid cells with n0 = {}, errors in grid cells".format(num_points, args.num))
+    print("{:18s} {:>11s} {:>10s} {:>10s} {:>10s}".format("run", "integrated", "max error", "median err", "time [s]"))
+
+    def report(name, run, fraction):
+        t = best_time(lambda: [run(x0, stepsize) for x0 in x0s], args.repeat)
+        errors = np.max(np.abs(np.array([run(x0, stepsize) for x0 in x0s]) - reference), axis=-1) * args.num
+        print("{:18s} {:10.0%} {:10.3f} {:10.3f} {:10.3f}".format(name, fraction, np.max(errors), np.median(errors), t))
+
+    report("linear", linear, 0.)
+    for tolerance in [0.3, 0.1, 0.03, 0.01]:
+        hybrid = ays.make_hybrid_run(parameters, offset, scaling_vector, tolerance=tolerance)
+        hybrid(x0s[0], stepsize)  # compile
+        hybrid.statistics.update(linear=0, integrated=0)
+        [hybrid(x0, stepsize) for x0 in x0s]
+        report("hybrid, tol {:g}".format(tolerance), hybrid, ays.integrated_fraction([hybrid]))
+    report("integration", integration, 1.)
+
+
+BENCHMARKS = {
+    "batch": benchmark_batch,
+    "coordinates": benchmark_coordinates,
+    "export": benchmark_export,
+    "faces": benchmark_faces,
+    "hybrid": benchmark_hybrid,
+    "integration": benchmark_integration,
+    "jacobian": benchmark_jacobian,
+    "startup": benchmark_startup,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark the optimized code paths of the AYS model scripts")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS),
+                        help="the benchmark to run")
+    parser.add_argument("--num", type=int, default=40,
+                        help="problem size, e.g. number of grid points per dimension (default: 40)")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="number of repetitions, the best time is shown (default: 3)")
+
+    # use argcomplete auto-completion
+    argcomplete.autocomplete(parser)
+
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args)
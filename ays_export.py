@@ -8,34 +8,196 @@ from pyviability import libviability as lv
 
 import numpy as np
 
+import functools as ft
+
 
 import os
+import json
 import argparse, argcomplete
 
+"""
+export formats:
+    txt:        the states only, one per line, after the header (the original format),
+                if points are filtered out, each line starts with the coordinates
+                as the line number doesn't give the grid point anymore
+    csv:        the coordinates and the state of each point, comma separated
+    npy:        a structured numpy array with the coordinates and the state as fields
+    columns:    a directory with one npy-file per column and 'columns.json'
+                describing them (like a columnar table, each column can be
+                memory-mapped on its own)
+"""
+EXPORT_FORMATS = ["txt", "csv", "npy", "columns"]
+COLUMNS_FILE = "columns.json"
+DEFAULT_CHUNK_SIZE = 2**18  # points
+
+
+def guess_format(fname):
+    ext = os.path.splitext(fname)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    elif ext == ".npy":
+        return "npy"
+    elif ext == "" and os.path.isdir(fname):
+        return "columns"
+    return "txt"
+
+
+def region_number(name):
+    """the number of the region 'name', e.g. 'SUNNY_UP', 'sunny-up' or '4'"""
+    if name.isdigit():
+        return int(name)
+    region = name.replace("-", "_").upper()
+    if not region in lv.REGIONS:
+        raise ValueError("unknown region {!r}".format(name))
+    return getattr(lv, region)
+
+
+def export_chunks(grid, states, *, regions=None, bbox=None, X_mid=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """yield (coordinates, states) of the selected points, 'chunk_size' points at a time
+
+    regions:    (list) of region numbers, only points in these regions are selected
+    bbox:       array with shape (dim, 2) of lower and upper bounds (in the exported
+                coordinates), only points inside are selected
+    X_mid:      if given, the coordinates are transformed back with inv_compactification
+    """
+    for start in range(0, len(states), chunk_size):
+        coordinates = np.asarray(grid[start:start + chunk_size])
+        chunk_states = np.asarray(states[start:start + chunk_size])
+        if X_mid is not None:
+            coordinates = ays_general.inv_compactification(coordinates, X_mid)
+        mask = np.ones(len(chunk_states), dtype=bool)
+        if regions is not None:
+            mask &= np.isin(chunk_states, regions)
+        if bbox is not None:
+            mask &= np.all((bbox[:, 0] <= coordinates) & (coordinates <= bbox[:, 1]), axis=-1)
+        yield coordinates[mask], chunk_states[mask]
+
+
+def format_chunk(coordinates, chunk_states, delimiter=" "):
+    """the lines of a chunk as one string, like np.savetxt with '%.17g' for the coordinates and '%i' for the state
+
+    the whole chunk is formatted at once instead of row by row, if
+    'coordinates' is None, only the states are written
+    """
+    if coordinates is None:
+        return "".join(map("{}\n".format, chunk_states.tolist()))
+    row = delimiter.join(["%.17g"] * coordinates.shape[1] + ["%i"]) + "\n"
+    return (row * len(chunk_states)) % tuple(np.column_stack((coordinates, chunk_states)).ravel().tolist())
+
+
+def write_txt(fname, chunks, header_txt, columns=None):
+    """write the states, and the coordinates in front of them if the names of all 'columns' are given"""
+    with open(fname, "w") as f:
+        f.write(header_txt + "\n")
+        if columns is None:
+            for _, chunk_states in chunks:
+                f.write(format_chunk(None, chunk_states))
+            return
+        f.write(" ".join(columns) + "\n")
+        for coordinates, chunk_states in chunks:
+            f.write(format_chunk(coordinates, chunk_states))
+
+
+def write_csv(fname, chunks, columns):
+    with open(fname, "w") as f:
+        f.write(",".join(columns) + "\n")
+        for coordinates, chunk_states in chunks:
+            f.write(format_chunk(coordinates, chunk_states, delimiter=","))
+
+
+def write_npy(fname, chunks, num, dtype):
+    out = np.lib.format.open_memmap(fname, mode="w+", dtype=dtype, shape=(num,))
+    names = dtype.names
+    start = 0
+    for coordinates, chunk_states in chunks:
+        stop = start + len(chunk_states)
+        for i, name in enumerate(names[:-1]):
+            out[name][start:stop] = coordinates[:, i]
+        out[names[-1]][start:stop] = chunk_states
+        start = stop
+    out.flush()
+    del out
+
+
+def write_columns(dirname, chunks, num, dtype, header):
+    os.makedirs(dirname, exist_ok=True)
+    names = dtype.names
+    outs = [np.lib.format.open_memmap(os.path.join(dirname, name + ".npy"), mode="w+",
+                                      dtype=dtype[name], shape=(num,))
+            for name in names]
+    start = 0
+    for coordinates, chunk_states in chunks:
+        stop = start + len(chunk_states)
+        for i, out in enumerate(outs[:-1]):
+            out[start:stop] = coordinates[:, i]
+        outs[-1][start:stop] = chunk_states
+        start = stop
+    for out in outs:
+        out.flush()
+    del outs
+    with open(os.path.join(dirname, COLUMNS_FILE), "w") as f:
+        json.dump({
+            "num": num,
+            "columns": [{"name": name, "file": name + ".npy", "dtype": dtype[name].str} for name in names],
+            "header": ays_general.recursive_dict2string(header),
+        }, f, indent=4)
+
+
 if __name__=="__main__":
     parser = argparse.ArgumentParser(
-        description="Export an AWS - TSM file to text.",
+        description="Export an AWS - TSM file to text, csv or numpy files.",
     )
     parser.add_argument("input_file", metavar="input-file",
                         help="file with the tsm data")
-    parser.add_argument("txt_file", metavar="txt-file", nargs="?", default="",
-                        help="output text file")
+    parser.add_argument("output_file", metavar="output-file", nargs="?", default="",
+                        help="output file (or directory for the 'columns' format)")
     parser.add_argument("-f", "--force", action="store_true",
-                        help="overwrite text file if already existing")
+                        help="overwrite output file if already existing")
+    parser.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="format of the output, 'txt' contains the states only "
+                        "(and the coordinates if '--regions' or '--bbox' is given) "
+                        "(default: guessed from the extension of 'output-file', 'txt' otherwise)")
+    parser.add_argument("--original", action="store_true",
+                        help="export the coordinates transformed back to A, W, S instead of a, w, s")
+    parser.add_argument("--regions", nargs="+", metavar="region",
+                        help="export only points in these regions (names or numbers)")
+    parser.add_argument("--bbox", nargs=6, type=float, metavar=("x0-min", "x0-max", "x1-min", "x1-max", "x2-min", "x2-max"),
+                        help="export only points inside this box (in the exported coordinates)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="number of points processed at a time (default: {})".format(DEFAULT_CHUNK_SIZE))
 
     # use argcomplete auto-completion
     argcomplete.autocomplete(parser)
 
     args = parser.parse_args()
 
-    if args.txt_file and (not args.force) :
-        if os.path.isfile(args.txt_file):
-            parser.error("'{}' exists already, use '--force' option to overwrite".format(args.txt_file))
+    if args.output_file and (not args.force) :
+        if os.path.exists(args.output_file):
+            parser.error("'{}' exists already, use '--force' option to overwrite".format(args.output_file))
+
+    if args.output_file == args.input_file:
+        parser.error("'input-file' and 'output-file' should be different from each other, not both '{}'".format(args.input_file))
 
-    if args.txt_file == args.input_file:
-        parser.error("'txt-file' and 'output-file' should be different from each other, not both '{}'".format(args.input_file))
+    if args.format is None:
+        args.format = guess_format(args.output_file)
 
-    header, data = ays_general.load_result_file(args.input_file)
+    regions = None
+    if args.regions:
+        try:
+            regions = [region_number(r) for r in args.regions]
+        except ValueError as e:
+            parser.error(str(e))
+
+    bbox = None
+    if args.bbox:
+        bbox = np.array(args.bbox).reshape(-1, 2)
+
+    if args.output_file:
+        # the arrays are memory-mapped, so only the current chunk is in memory
+        header, data = ays_general.load_result_file(args.input_file)
+    else:
+        # only the header is shown
+        header = ays_general.load_result_file(args.input_file, header_only=True)
 
     header_txt = "#"*80 + "\n"
     header_txt += ays_general.recursive_dict2string(header)
@@ -45,11 +207,35 @@ if __name__=="__main__":
         header_txt += "{} = {:>2d}\n".format(region, getattr(lv, region))
     header_txt += "#"*80
 
-    states = data["states"]
-
     print(header_txt)
 
-    if args.txt_file:
-        print("saving to {!r} ... ".format(args.txt_file), end="", flush=True)
-        np.savetxt(args.txt_file, states, fmt="%i", header=header_txt, comments="")
+    if args.output_file:
+        grid, states = data["grid"], data["states"]
+        columns = ["a", "w", "s"]
+        X_mid = None
+        if args.original:
+            if not header["viab-backscaling-done"]:
+                parser.error("'--original' needs a backscaled grid")
+            X_mid = np.array([header["grid-parameters"][key] for key in ["A_mid", "W_mid", "S_mid"]])
+            columns = ["A", "W", "S"]
+        if bbox is not None and len(bbox) != grid.shape[1]:
+            parser.error("'--bbox' needs lower and upper bounds for all {} dimensions".format(grid.shape[1]))
+
+        chunks = ft.partial(export_chunks, grid, states, regions=regions, bbox=bbox, X_mid=X_mid,
+                            chunk_size=args.chunk_size)
+
+        print("saving to {!r} ({}) ... ".format(args.output_file, args.format), end="", flush=True)
+        if args.format == "txt":
+            filtered = regions is not None or bbox is not None
+            write_txt(args.output_file, chunks(), header_txt, columns=columns + ["state"] if filtered else None)
+        elif args.format == "csv":
+            write_csv(args.output_file, chunks(), columns + ["state"])
+        else:
+            # the size of the output is needed in advance
+            num = sum(len(chunk_states) for _, chunk_states in chunks())
+            dtype = np.dtype([(name, grid.dtype) for name in columns] + [("state", states.dtype)])
+            if args.format == "npy":
+                write_npy(args.output_file, chunks(), num, dtype)
+            else:
+                write_columns(args.output_file, chunks(), num, dtype, header)
         print("done")
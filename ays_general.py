@@ -2,20 +2,20 @@
 
 from pyviability import libviability as lv
 
+import hashlib
 import heapq as hq
-import functools as ft
-
-import matplotlib.pyplot as plt
-import mpl_toolkits.mplot3d as plt3d
-import matplotlib.ticker as ticker
-from matplotlib import animation
 
+import multiprocessing as mp
 import numpy as np
 import operator as op
+import os
 import pickle
+import resource
 import signal
+import struct
 import sys
 import warnings as warn
+import zlib
 
 
 def versioninfo2version(v_info):
@@ -23,13 +23,18 @@ def versioninfo2version(v_info):
 
 DEFAULT_VERSION_INFO = (0, 1)  # that's where it all started
 
-version_info = __version_info__ = (0, 3)
+version_info = __version_info__ = (0, 8)
 version = __version__ = versioninfo2version(__version_info__)
 
 
 """
 aws-file version changes:
 # Note that the abbreviation aws is used here instead of ays, to keep the compatibility with the older files.
+0.8: added 'finished' (whether the computation ran through, an empty 'computation-status' is ambiguous otherwise)
+0.7: added 'equilibria'' (fixed points of the default and the management options with their stability)
+0.6: added 'profile' (wall / CPU time, run function evaluations and peak memory per topology step)
+0.5: added 'region-volumes' (number of points in each region, computed when saving)
+0.4: new memory-mappable file format (see RESULT_FILE_MAGIC), header and data unchanged
 0.3: added 'computation-status'
 0.2: the first ones with actual versioning, adding 'paths-lake' if paths has been given
 no version or 0.1: the stuff from the beginning
@@ -44,20 +49,6 @@ AZIMUTH, ELEVATION = 5, 20
 AZIMUTH, ELEVATION = 170, 10
 
 
-# patch to remove padding at ends of axes:
-###patch start###
-from mpl_toolkits.mplot3d.axis3d import Axis
-if not hasattr(Axis, "_get_coord_info_old"):
-    def _get_coord_info_new(self, renderer):
-        mins, maxs, centers, deltas, tc, highs = self._get_coord_info_old(renderer)
-        mins += deltas / 4
-        maxs -= deltas / 4
-        return mins, maxs, centers, deltas, tc, highs
-    Axis._get_coord_info_old = Axis._get_coord_info
-    Axis._get_coord_info = _get_coord_info_new
-###patch end###
-
-
 def remove_inner(arr):
     arr = np.asarray(arr)
     assert len(arr.shape) == 2
@@ -66,21 +57,23 @@ def remove_inner(arr):
     # for i in range(l):
 
 
-@np.vectorize
 def compactification(x, x_mid):
-    if x == 0:
-        return 0.
-    if x == np.infty:
-        return 1.
-    return x / (x + x_mid)
+    """map x in [0, infty] to x / (x + x_mid) in [0, 1], elementwise and broadcasting like a ufunc"""
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = x / (x + x_mid)
+    y = np.where(x == np.infty, 1., y)
+    y = np.where(x == 0, 0., y)
+    return y[()]  # scalars for scalar input
 
-@np.vectorize
 def inv_compactification(y, x_mid):
-    if y == 0:
-        return 0.
-    if np.allclose(y, 1):
-        return np.infty
-    return x_mid * y / (1 - y)
+    """inverse of compactification, i.e. map y in [0, 1] to x_mid * y / (1 - y) in [0, infty]"""
+    y = np.asarray(y, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = x_mid * y / (1 - y)
+    x = np.where(np.isclose(y, 1), np.infty, x)
+    x = np.where(y == 0, 0., x)
+    return x[()]  # scalars for scalar input
 
 def transformed_space(transform, inv_transform,
                       start=0, stop=np.infty, num=12,
@@ -146,211 +139,22 @@ def transformed_space(transform, inv_transform,
         string_formatters[~mask_nan] = np.round(formatters[~mask_nan], decimals=2).astype(int).astype("|U10")
         return string_formatters, locators
 
-def animate(fig, ax3d, fname):
-    assert fname.endswith(".mp4"), "for now '.mp4' files for video only"
-    def turning_animation(i):
-        ax3d.view_init(ELEVATION, AZIMUTH + i)
-    # Animate
-    anim = animation.FuncAnimation(fig, turning_animation, 
-                                   init_func=init,
-                                   frames=360, interval=20, blit=True)
-    # Save
-    anim.save(fname, fps=30, extra_args=['-vcodec', 'libx264'])
-    # ax3d.view_init(ELEVATION, AZIMUTH)
-
-def create_figure(*bla, S_scale = 1e9, W_scale = 1e12, W_mid = None, S_mid = None, boundaries = None, transformed_formatters=False,
-                  num_a = 12, num_y = 12, num_s = 12, **kwargs):
-
-
-    kwargs = dict(kwargs)
-
-    if boundaries is None:
-        boundaries = [None]*3
-
-    fig = plt.figure(figsize=(16,9))
-    ax3d = plt3d.Axes3D(fig)
-    ax3d.set_xlabel("\n\nexcess atmospheric carbon\nstock A [GtC]")
-    ax3d.set_ylabel("\neconomic output Y [%1.0e USD/yr]"%W_scale)
-    ax3d.set_zlabel("\n\nrenewable knowledge\nstock S [%1.0e GJ]"%S_scale)
-
-    # make proper tickmarks:
-    if "A_max" in kwargs:
-        A_max = kwargs.pop("A_max")
-        Aticks = np.linspace(0,A_max,11)
-        ax3d.w_xaxis.set_major_locator(ticker.FixedLocator(Aticks))
-        ax3d.w_xaxis.set_major_formatter(ticker.FixedFormatter(Aticks.astype("int")))
-        if boundaries is None:
-            ax3d.set_xlim(Aticks[0],Aticks[-1])
-        else:
-            ax3d.set_xlim(*boundaries[0])
-    elif "A_mid" in kwargs:
-        A_mid = kwargs.pop("A_mid")
-        transf = ft.partial(compactification, x_mid=A_mid)
-        inv_transf = ft.partial(inv_compactification, x_mid=A_mid)
-
-        if boundaries[0] is None:
-            start, stop = 0, np.infty
-        else:
-            start, stop = inv_transf(boundaries[0])
-        formatters, locators = transformed_space(transf, inv_transf, axis_use=True, start=start, stop=stop, num=num_a)
-        if transformed_formatters:
-            new_formatters = []
-            for el, loc in zip(formatters, locators):
-                if el:
-                    new_formatters.append("{:4.2f}".format(loc))
-                else:
-                    new_formatters.append(el)
-            formatters = new_formatters
-        ax3d.w_xaxis.set_major_locator(ticker.FixedLocator(locators))
-        ax3d.w_xaxis.set_major_formatter(ticker.FixedFormatter(formatters))
-
-        if boundaries[0] is None:
-            ax3d.set_xlim(0,1)
-        else:
-            ax3d.set_xlim(*boundaries[0])
-
-    else:
-        raise KeyError("can't find proper key for 'A' in kwargs that determines which representation of 'A' has been used")
-
-    if kwargs:
-        warn.warn("omitted arguments: {}".format(", ".join(sorted(kwargs))), stacklevel=2)
-
-    transf = ft.partial(compactification, x_mid=W_mid)
-    inv_transf = ft.partial(inv_compactification, x_mid=W_mid)
-
-    if boundaries[1] is None:
-        start, stop = 0, np.infty
-    else:
-        start, stop = inv_transf(boundaries[1])
-    formatters, locators = transformed_space(transf, inv_transf, axis_use=True, scale=W_scale, start=start, stop=stop, num=num_y)
-    if transformed_formatters:
-        new_formatters = []
-        for el, loc in zip(formatters, locators):
-            if el:
-                new_formatters.append("{:4.2f}".format(loc))
-            else:
-                new_formatters.append(el)
-        formatters = new_formatters
-    ax3d.w_yaxis.set_major_locator(ticker.FixedLocator(locators))
-    ax3d.w_yaxis.set_major_formatter(ticker.FixedFormatter(formatters))
-
-    if boundaries[1] is None:
-        ax3d.set_ylim(0,1)
-    else:
-        ax3d.set_ylim(*boundaries[1])
-
-
-    transf = ft.partial(compactification, x_mid=S_mid)
-    inv_transf = ft.partial(inv_compactification, x_mid=S_mid)
-
-    if boundaries[2] is None:
-        start, stop = 0, np.infty
-    else:
-        start, stop = inv_transf(boundaries[2])
-    formatters, locators = transformed_space(transf, inv_transf, axis_use=True, scale=S_scale, start=start, stop=stop, num=num_s)
-    if transformed_formatters:
-        new_formatters = []
-        for el, loc in zip(formatters, locators):
-            if el:
-                new_formatters.append("{:4.2f}".format(loc))
-            else:
-                new_formatters.append(el)
-        formatters = new_formatters
-    ax3d.w_zaxis.set_major_locator(ticker.FixedLocator(locators))
-    ax3d.w_zaxis.set_major_formatter(ticker.FixedFormatter(formatters))
-
-    if boundaries[2] is None:
-        ax3d.set_zlim(0,1)
-    else:
-        ax3d.set_zlim(*boundaries[2])
+def _plotting():
+    """import the plotting helpers (and with them matplotlib) only when they are actually needed"""
+    import ays_plotting
+    return ays_plotting
 
-    ax3d.view_init(ELEVATION, AZIMUTH)
+def animate(*args, **kwargs):
+    return _plotting().animate(*args, **kwargs)
 
-    return fig, ax3d
+def create_figure(*args, **kwargs):
+    return _plotting().create_figure(*args, **kwargs)
 
+def add_boundary(*args, **kwargs):
+    return _plotting().add_boundary(*args, **kwargs)
 
-def add_boundary(ax3d, *, sunny_boundaries, add_outer=False, plot_boundaries=None, **parameters):
-# def add_boundary(ax3d, *, boundary = ["planetary-boundary"], add_outer=False, plot_boundaries=None, **parameters):
-    """show boundaries of desirable region"""
-
-    if not sunny_boundaries:
-        # nothing to do
-        return 
-
-    # get the boundaries of the plot (and check whether it's an old one where "A" wasn't transformed yet
-    if plot_boundaries is None:
-        if "A_max" in parameters:
-            a_min, a_max = 0, parameters["A_max"]
-        elif "A_mid" in parameters:
-            a_min, a_max = 0, 1
-        w_min, w_max = 0, 1
-        s_min, s_max = 0, 1
-    else:
-        a_min, a_max = plot_boundaries[0]
-        w_min, w_max = plot_boundaries[1]
-        s_min, s_max = plot_boundaries[2]
-
-    plot_pb = False
-    plot_sf = False
-    if "planetary-boundary" in sunny_boundaries:
-        A_PB = parameters["A_PB"]
-        if "A_max" in parameters:
-            pass # no transformation necessary
-        elif "A_mid" in parameters:
-            A_PB = A_PB / (A_PB + parameters["A_mid"])
-        else:
-            assert False, "couldn't identify how the A axis is scaled"
-        if a_min < A_PB < a_max:
-            plot_pb = True
-    if "social-foundation" in sunny_boundaries:
-        W_SF = parameters["W_SF"]
-        W_SF = W_SF / (W_SF + parameters["W_mid"])
-        if w_min < W_SF < w_max:
-            plot_sf = True
-
-
-    if plot_pb and plot_sf:
-        corner_points_list = [[
-                [A_PB , W_SF , s_min],
-                [A_PB , w_max, s_min],
-                [A_PB , w_max, s_max],
-                [A_PB , W_SF , s_max],
-                ],
-                [
-                [A_PB , W_SF , s_max],
-                [a_min, W_SF, s_max],
-                [a_min, W_SF, s_min],
-                [A_PB , W_SF , s_min],
-                ]]
-    elif plot_pb:
-        corner_points_list = [[[A_PB,w_min,s_min],[A_PB,w_max,s_min],[A_PB,w_max,s_max],[A_PB,w_min,s_max]]]
-    elif plot_sf:
-        corner_points_list = [[[a_min,W_SF,s_min],[a_max,W_SF,s_min],[a_max,W_SF,s_max],[a_min,W_SF,s_max]]]
-    else:
-        raise ValueError("something wrong with sunny_boundaries = {!r}".format(sunny_boundaries))
-
-    boundary_surface_PB = plt3d.art3d.Poly3DCollection(corner_points_list)
-    boundary_surface_PB.set_color("gray")
-    boundary_surface_PB.set_edgecolor("gray")
-    boundary_surface_PB.set_alpha(0.25)
-    ax3d.add_collection3d(boundary_surface_PB)
-
-    # elif boundary == "both":
-        # raise NotImplementedError("will be done soon")
-        # boundary_surface_both = plt3d.art3d.Poly3DCollection([[[0,.5,0],[0,.5,1],[A_PB,.5,1],[A_PB,.5,0]],
-                                                        # [[A_PB,.5,0],[A_PB,1,0],[A_PB,1,1],[A_PB,.5,1]]])
-        # boundary_surface_both.set_color("gray"); boundary_surface_both.set_edgecolor("gray"); boundary_surface_both.set_alpha(0.25)
-        # ax3d.add_collection3d(boundary_surface_both)
-    # else:
-        # raise NameError("Unkown boundary {!r}".format(boundary))
-    # 
-    # if add_outer:
-        # # add outer limits of undesirable view from standard view perspective:
-        # undesirable_outer_stdview = plt3d.art3d.Poly3DCollection([[[0,0,0],[0,0,1],[0,.5,1],[0,.5,0]],
-                                            # [[A_PB,1,0],[aws.A_max,1,0],[aws.A_max,1,1],[A_PB,1,1]],
-                                            # [[0,0,0],[0,.5,0],[A_PB,.5,0],[A_PB,1,0],[aws.A_max,1,0],[aws.A_max,0,0]]])
-        # undesirable_outer_stdview.set_color("gray"); undesirable_outer_stdview.set_edgecolor("gray"); undesirable_outer_stdview.set_alpha(0.25)
-        # ax3d.add_collection3d(undesirable_outer_stdview)
+def add_segments(*args, **kwargs):
+    return _plotting().add_segments(*args, **kwargs)
 
 
 def formatted_value(val):
@@ -397,6 +201,19 @@ def print_changed_parameters(pars, default_pars, prefix=""):
             print(("{} = {} (default: {})").format(par, *map(formatted_value, model_changed_pars[par])))
         print()
 
+def print_equilibria(equilibria, prefix="  "):
+    """print the fixed points as returned by ays_model.find_equilibria"""
+    if not equilibria:
+        print(prefix + "(none found)")
+    for equilibrium in equilibria:
+        print(prefix + "(a, y, s) = ({:.6f}, {:.6f}, {:.6f})  {:<14s}  eigenvalues: {}".format(
+            *equilibrium["point"], equilibrium["stability"],
+            ", ".join("{:.4g}".format(ev) for ev in equilibrium["eigenvalues"])), end="")
+        # older files don't have the residual
+        if "residual" in equilibrium:
+            print("  residual: {:.1e}".format(equilibrium["residual"]), end="")
+        print()
+
 def recursive_dict2string(dic, prefix="", spacing=" "*4):
     ret = ""
     for key in sorted(dic):
@@ -462,26 +279,373 @@ def follow_indices(starting_indices, *,
     if verbose < 2:
         print("done")
 
+def follow_indices_bulk(starting_indices, *,
+        grid, paths,
+        isinside=None,
+        fallback_paths=None,
+        ):
+    """follow the paths from all 'starting_indices' at once, see follow_indices
+
+    isinside:   (function) maps segments with shape (n, 2, dim) to a bool array
+                of shape (n,), paths are not followed beyond segments outside
+                default: None, meaning everything is inside
+    returns the indices of all reached points, their segments with shape
+    (n, 2, dim) and the choices of the segments
+    """
+    next_indices = np.asarray(paths["next point index"])
+    if fallback_paths is not None:
+        next_indices = np.where(next_indices == lv.PATHS_INDEX_DEFAULT,
+                                np.asarray(fallback_paths["next point index"]),
+                                next_indices)
+    reached_points = paths["reached point"]
+
+    seen = np.zeros(next_indices.shape, dtype=bool)
+    followed = np.zeros(next_indices.shape, dtype=bool)
+    current = np.unique(np.asarray(starting_indices, dtype=int))
+    # breadth-first, i.e. one step of all the paths at a time
+    while current.size:
+        seen[current] = True
+        if isinside is not None:
+            current = current[isinside(np.stack((grid[current], reached_points[current]), axis=1))]
+        followed[current] = True
+        next_current = next_indices[current]
+        next_current = np.unique(next_current[(next_current != lv.PATHS_INDEX_DEFAULT) & (next_current != current)])
+        current = next_current[~seen[next_current]]
+
+    indices = np.flatnonzero(followed)
+    segments = np.stack((grid[indices], reached_points[indices]), axis=1)
+    return indices, segments, np.asarray(paths["choice"])[indices]
+
+def needs_reformat(filename):
+    """check (using the header only) whether 'filename' has an older format than the current one"""
+    header = load_result_file(filename, version_check=False, header_only=True)
+    return header.get("aws-version-info", DEFAULT_VERSION_INFO) != __version_info__
+
 def reformat(filename, *, verbose=0):
-    """load file and then update header and data"""
+    """load file and then update header and data, the storage of the paths is kept"""
+    paths_storage = get_paths_storage(filename)
     header, data = load_result_file(filename, version_check=False, verbose=verbose)
 
     # the actually change of the format is done in _reformat
     header, data = _reformat(header, data, verbose=verbose)
 
-    save_result_file(filename, header, data, verbose=verbose)
+    save_result_file(filename, header, data, paths_storage=paths_storage, verbose=verbose)
+
+"""
+result file format (since aws-file version 0.4):
+    RESULT_FILE_MAGIC
+    header length and index length (two little-endian uint64)
+    header (pickled)
+    index (pickled list with one entry per array in data, giving its key, dtype,
+           shape and offset; values that are no plain arrays are stored inline)
+    the raw array payloads, each aligned to RESULT_FILE_ALIGNMENT bytes
+so the arrays can be memory-mapped and are only read when they are actually used.
+Arrays can be stored encoded (see PATHS_STORAGE), then their index entry has an
+'encoding' (narrower dtype, quantization, zlib compressed chunks) or they are
+not stored at all and 'derived' from other arrays when loading.
+Files without the magic bytes are the pickled (header, data) tuples of the older versions.
+"""
+RESULT_FILE_MAGIC = b"\x93AYSRES\x00"
+RESULT_FILE_ALIGNMENT = 64
+_RESULT_FILE_LENGTHS = struct.Struct("<QQ")
+
 
-def save_result_file(fname, header, data, *, verbose=0):
-    """save 'header' and 'data' to 'fname'"""
+def _aligned(offset):
+    return -(-offset // RESULT_FILE_ALIGNMENT) * RESULT_FILE_ALIGNMENT
+
+def _flatten_data(data, prefix=()):
+    """yield (key-tuple, value) for all leaves of the (nested) dict 'data'"""
+    for key in data:
+        if isinstance(data[key], dict):
+            yield from _flatten_data(data[key], prefix=prefix + (key,))
+        else:
+            yield prefix + (key,), data[key]
+
+def _unflatten_data(items):
+    data = {}
+    for keys, val in items:
+        current = data
+        for key in keys[:-1]:
+            current = current.setdefault(key, {})
+        current[keys[-1]] = val
+    return data
+
+"""
+storage modes of the recorded paths ('paths' and 'paths-lake') in the result files:
+    full:       as they are
+    compact:    lossless, the indices in the smallest sufficient integer type,
+                the choices as uint8, the reached points are dropped if they
+                coincide with the grid points of the next point indices, all
+                compressed in chunks of PATHS_COMPRESSION_CHUNK bytes
+    quantized:  like compact, but reached points that can't be dropped are
+                quantized to 16 bit per coordinate (lossy)
+load_result_file restores the original layout of the paths in any case.
+"""
+PATHS_STORAGE = ["full", "compact", "quantized"]
+PATHS_COMPRESSION_CHUNK = 2**22  # bytes
+PATHS_COMPRESSION_LEVEL = 6
+_QUANTIZATION_DTYPE = np.dtype(np.uint16)
+_QUANTIZATION_NAN = np.iinfo(_QUANTIZATION_DTYPE).max
+
+
+def _nan_equal(x, y):
+    return np.all((x == y) | (np.isnan(x) & np.isnan(y)))
+
+def _smallest_int_dtype(arr, default=None):
+    """the smallest integer dtype that holds all values of 'arr' (apart from 'default')
+    and the value 'default' is stored as in that dtype"""
+    values = arr if default is None else arr[arr != default]
+    low, high = (int(values.min()), int(values.max())) if values.size else (0, 0)
+    for dtype in map(np.dtype, [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32, np.int64]):
+        info = np.iinfo(dtype)
+        if not (info.min <= low and high <= info.max):
+            continue
+        if default is None or info.min <= default <= info.max:
+            return dtype, default
+        # the default doesn't fit, store it as a value that isn't used otherwise
+        for fill in [info.max, info.min]:
+            if not low <= fill <= high:
+                return dtype, fill
+    return arr.dtype, default
+
+def _paths_encodings(key, paths, grid, storage):
+    """the encodings (see _encode_array) of the arrays in 'paths' for the given 'storage' mode"""
+    encodings = {}
+    if storage == "full" or not isinstance(paths, dict) or not paths:
+        return encodings
+    # the mode is recorded in the index, see get_paths_storage
+    compress = {"compress": True, "storage": storage}
+
+    next_index = np.asarray(paths["next point index"])
+    index_dtype, index_fill = _smallest_int_dtype(next_index, default=lv.PATHS_INDEX_DEFAULT)
+    encodings[(key, "next point index")] = dict(compress, dtype=index_dtype.str,
+                                                fill=(lv.PATHS_INDEX_DEFAULT, index_fill))
+
+    choice = np.asarray(paths["choice"])
+    choice_dtype, _ = _smallest_int_dtype(choice)
+    encodings[(key, "choice")] = dict(compress, dtype=choice_dtype.str, fill=None)
+
+    reached = np.asarray(paths["reached point"])
+    unset = (next_index == lv.PATHS_INDEX_DEFAULT)
+    recoverable = grid is not None and reached.shape == np.shape(grid) and \
+        _nan_equal(reached[~unset], np.asarray(grid)[next_index[~unset]])
+    if recoverable and np.any(unset):
+        # all the points without a path need to have the same reached point
+        recoverable = _nan_equal(reached[unset], reached[unset][0])
+    if recoverable:
+        encodings[(key, "reached point")] = {"derived": True, "storage": storage,
+                                             "index": (key, "next point index"),
+                                             "unset": reached[unset][0].tolist() if np.any(unset) else None}
+    elif storage == "quantized" and np.issubdtype(reached.dtype, np.floating):
+        finite = np.isfinite(reached)
+        low = np.array([np.min(col[fin]) if np.any(fin) else 0. for col, fin in zip(reached.T, finite.T)])
+        high = np.array([np.max(col[fin]) if np.any(fin) else 0. for col, fin in zip(reached.T, finite.T)])
+        step = (high - low) / (_QUANTIZATION_NAN - 1)
+        step[step == 0] = 1.
+        encodings[(key, "reached point")] = dict(compress, quantize=(low.tolist(), step.tolist()))
+    else:
+        encodings[(key, "reached point")] = compress
+    return encodings
+
+def _encode_array(arr, encoding):
+    """encode 'arr' for writing, returns the bytes to be written and the 'encoding' entry of the index"""
+    entry = {"dtype": arr.dtype.str, "fill": None, "quantize": None, "chunks": None}
+    if encoding.get("quantize") is not None:
+        low, step = map(np.asarray, encoding["quantize"])
+        finite = np.isfinite(arr)
+        stored = np.full(arr.shape, _QUANTIZATION_NAN, dtype=_QUANTIZATION_DTYPE)
+        stored[finite] = np.rint((arr - low) / step)[finite]
+        entry["quantize"] = encoding["quantize"]
+    else:
+        stored = arr
+        if encoding.get("fill") is not None:
+            original, new = encoding["fill"]
+            stored = np.where(arr == original, new, arr)
+            entry["fill"] = encoding["fill"]
+        if "dtype" in encoding:
+            stored = stored.astype(encoding["dtype"])
+    entry["dtype"] = stored.dtype.str
+    payload = np.ascontiguousarray(stored).tobytes()
+    if encoding.get("compress"):
+        chunks = [zlib.compress(payload[i:i + PATHS_COMPRESSION_CHUNK], PATHS_COMPRESSION_LEVEL)
+                  for i in range(0, len(payload), PATHS_COMPRESSION_CHUNK)]
+        entry["chunks"] = [len(chunk) for chunk in chunks]
+        payload = b"".join(chunks)
+    return payload, entry
+
+def _decode_array(payload, entry):
+    """inverse of _encode_array, 'payload' are the bytes (or an uint8 array) that have been written"""
+    encoding = entry["encoding"]
+    if encoding["chunks"] is not None:
+        chunks = []
+        start = 0
+        for length in encoding["chunks"]:
+            chunks.append(zlib.decompress(payload[start:start + length]))
+            start += length
+        payload = b"".join(chunks)
+    stored = np.frombuffer(payload, dtype=encoding["dtype"]).reshape(entry["shape"])
+    if encoding["quantize"] is not None:
+        low, step = map(np.asarray, encoding["quantize"])
+        arr = (low + stored * step).astype(entry["dtype"])
+        arr[stored == _QUANTIZATION_NAN] = np.nan
+        return arr
+    arr = stored.astype(entry["dtype"])
+    if encoding["fill"] is not None:
+        original, new = encoding["fill"]
+        arr[stored == new] = original
+    return arr
+
+def _derive_array(entry, items):
+    """restore an array that hasn't been stored from the grid and the next point indices"""
+    index = items[entry["index"]]
+    unset = (index == lv.PATHS_INDEX_DEFAULT)
+    arr = np.empty(entry["shape"], dtype=entry["dtype"])
+    arr[~unset] = items[("grid",)][index[~unset]]
+    if entry["unset"] is not None:
+        arr[unset] = entry["unset"]
+    return arr
+
+def _write_array_container(f, header, data, encodings=None):
+    if encodings is None:
+        encodings = {}
+    index = []
+    arrays = []
+    current_offset = 0
+    for keys, val in _flatten_data(data):
+        if isinstance(val, np.ndarray) and not val.dtype.hasobject:
+            arr = np.ascontiguousarray(val)
+            encoding = encodings.get(keys)
+            entry = {"key": keys, "dtype": arr.dtype.str, "shape": arr.shape}
+            if encoding is not None and "storage" in encoding:
+                entry["storage"] = encoding["storage"]
+            if encoding is not None and encoding.get("derived"):
+                entry["derived"] = {"index": encoding["index"], "unset": encoding["unset"]}
+                index.append(entry)
+                continue
+            if encoding is not None:
+                arr, entry["encoding"] = _encode_array(arr, encoding)
+                nbytes = len(arr)
+            else:
+                nbytes = arr.nbytes
+            current_offset = _aligned(current_offset)
+            entry["offset"] = current_offset
+            index.append(entry)
+            arrays.append((current_offset, arr))
+            current_offset += nbytes
+        else:
+            index.append({"key": keys, "value": val})
+
+    header_bytes = pickle.dumps(header)
+    index_bytes = pickle.dumps(index)
+    f.write(RESULT_FILE_MAGIC)
+    f.write(_RESULT_FILE_LENGTHS.pack(len(header_bytes), len(index_bytes)))
+    f.write(header_bytes)
+    f.write(index_bytes)
+    data_start = _aligned(f.tell())
+    for offset, arr in arrays:
+        f.write(b"\0" * (data_start + offset - f.tell()))
+        if isinstance(arr, bytes):
+            f.write(arr)
+        else:
+            arr.tofile(f)
+
+def _read_array_container(f, fname, *, mmap=True, header_only=False):
+    header_length, index_length = _RESULT_FILE_LENGTHS.unpack(f.read(_RESULT_FILE_LENGTHS.size))
+    header = pickle.loads(f.read(header_length))
+    if header_only:
+        return header, None
+    index = pickle.loads(f.read(index_length))
+    data_start = _aligned(f.tell())
+    items = []
+    derived = []
+    for entry in index:
+        if "value" in entry:
+            items.append((entry["key"], entry["value"]))
+            continue
+        if "derived" in entry:
+            derived.append(entry)
+            continue
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        count = int(np.prod(shape))
+        if count == 0:
+            arr = np.empty(shape, dtype=dtype)
+        elif "encoding" in entry:
+            encoding = entry["encoding"]
+            if encoding["chunks"] is not None:
+                nbytes = sum(encoding["chunks"])
+            else:
+                nbytes = count * np.dtype(encoding["dtype"]).itemsize
+            f.seek(data_start + entry["offset"])
+            arr = _decode_array(f.read(nbytes), entry)
+        elif mmap:
+            # lazy, only the pages that are accessed are actually read
+            arr = np.memmap(fname, dtype=dtype, mode="r", offset=data_start + entry["offset"], shape=shape)
+        else:
+            f.seek(data_start + entry["offset"])
+            arr = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+        items.append((entry["key"], arr))
+    if derived:
+        all_items = dict(items)
+        for entry in derived:
+            items.append((entry["key"], _derive_array(dict(entry["derived"], **entry), all_items)))
+    return header, _unflatten_data(items)
+
+def get_paths_storage(fname):
+    """the storage mode (see PATHS_STORAGE) of the recorded paths in the result file 'fname'"""
+    with open(fname, "rb") as f:
+        if f.read(len(RESULT_FILE_MAGIC)) != RESULT_FILE_MAGIC:
+            return "full"
+        header_length, index_length = _RESULT_FILE_LENGTHS.unpack(f.read(_RESULT_FILE_LENGTHS.size))
+        f.seek(header_length, os.SEEK_CUR)
+        index = pickle.loads(f.read(index_length))
+    # check all entries, in quantized storage only the reached points that
+    # can't be derived from the grid are quantized; files written before the
+    # mode was recorded in the index are recognized by their encodings
+    storage = "full"
+    for entry in index:
+        if entry["key"][:1] in [("paths",), ("paths-lake",)]:
+            if entry.get("storage") == "quantized" or (entry.get("encoding") or {}).get("quantize") is not None:
+                return "quantized"
+            if entry.get("storage") == "compact" or "encoding" in entry or "derived" in entry:
+                storage = "compact"
+    return storage
+
+def save_result_file(fname, header, data, *, paths_storage="full", verbose=0):
+    """save 'header' and 'data' to 'fname'
+
+    the file is written to a temporary file first and then moved to 'fname',
+    so a file that is still memory-mapped (e.g. when reformatting) is not
+    overwritten while it is read
+
+    'paths_storage' is one of PATHS_STORAGE and determines how 'paths' and
+    'paths-lake' are stored
+
+    'region-volumes' of the header is (re)computed from the states
+    """
+    if paths_storage not in PATHS_STORAGE:
+        raise ValueError("unknown paths storage {!r}".format(paths_storage))
+    header = dict(header, **{"region-volumes": region_volumes(data["states"], weights=_data_weights(data))})
     try:
         _check_format(header, data)
     except AssertionError:
         warn.warn("the generated 'header' and 'data' failed at least one consistency check, saving anyway")
 
+    encodings = {}
+    for key in ["paths", "paths-lake"]:
+        if key in data:
+            encodings.update(_paths_encodings(key, data[key], data.get("grid"), paths_storage))
+
     if verbose:
         print("saving to {!r} ... ".format(fname), end="", flush=True)
-    with open(fname, "wb") as f:
-        pickle.dump((header, data), f)
+    tmp_fname = "{}.{}.tmp".format(fname, os.getpid())
+    try:
+        with open(tmp_fname, "wb") as f:
+            _write_array_container(f, header, data, encodings=encodings)
+        os.replace(tmp_fname, fname)
+    finally:
+        if os.path.exists(tmp_fname):
+            os.remove(tmp_fname)
     if verbose:
         print("done")
 
@@ -489,26 +653,43 @@ def load_result_file(fname, *,
                      version_check=True,
                      consistency_check=True,
                      auto_reformat=False,
+                     mmap=True,
+                     header_only=False,
                      verbose=0
                      ):
     """loads the file 'fname' and performs some checks
     
     note that the options are interdependent: 'auto_reformat' needs 'consistency_check' needs 'version_check'
+
+    with 'mmap' (default) the arrays in data are read-only memory maps that
+    are only read from disk when accessed (files of version 0.4 and newer only)
+
+    with 'header_only' only the header is read (and version checked / reformatted)
+    and returned instead of the tuple (header, data); the array payload isn't
+    touched at all, except for the old pickled files which have to be read completely
+
+    encoded paths (see PATHS_STORAGE) are decoded to their original layout,
+    they are read into memory instead of being memory-mapped
     """
     if verbose:
-        print("loading {} ... ".format(fname), end="", flush=True)
+        print("loading {}{} ... ".format("header of " if header_only else "", fname), end="", flush=True)
     with open(fname, "rb") as f:
-        header, data = pickle.load(f)
+        if f.read(len(RESULT_FILE_MAGIC)) == RESULT_FILE_MAGIC:
+            header, data = _read_array_container(f, fname, mmap=mmap, header_only=header_only)
+        else:
+            f.seek(0)
+            header, data = pickle.load(f)
+            if header_only:
+                data = None
     if verbose:
         print("done", flush=True)
-    if not version_check:
-        return header, data
-    if "aws-version-info" in header and header["aws-version-info"] == __version_info__:
-        return header, data
-    if auto_reformat:
+    if version_check and not ("aws-version-info" in header and header["aws-version-info"] == __version_info__):
+        if not auto_reformat:
+            raise IOError("please reformat the file (from version {} to {})".format(versioninfo2version(header.pop("aws-version-info", DEFAULT_VERSION_INFO)), __version__))
         header, data = _reformat(header, data, verbose=verbose)
-        return header, data
-    raise IOError("please reformat the file (from version {} to {})".format(versioninfo2version(header.pop("aws-version-info", DEFAULT_VERSION_INFO)), __version__))
+    if header_only:
+        return header
+    return header, data
 
 DEFAULT_HEADER = {
                 "aws-version-info": DEFAULT_VERSION_INFO,
@@ -529,11 +710,15 @@ DEFAULT_HEADER = {
                 "out-of-bounds": None,
                 "remember-paths": False,
                 "computation-status": "",
+                "region-volumes": None,
+                "profile": None,
+                "equilibria": None,
+                "finished": None,
                 }
 
 
 def _check_format(header, data):
-    """consistency checks"""
+    """consistency checks (of the header only if 'data' is None)"""
 
     assert header["aws-version-info"] == __version_info__
 
@@ -548,10 +733,12 @@ def _check_format(header, data):
             print("missing keys: " + ", ".join(new_header_missing))
         raise KeyError("header has not the proper key set")
 
+    if data is None:
+        return
 
     # keys for data
     data_mandatory_keys = ["grid", "states"]
-    data_optional_keys  = ["paths", "paths-lake"]
+    data_optional_keys  = ["paths", "paths-lake", "grid-levels"]
     # check data contains all necessary keys
     assert set(data_mandatory_keys).issubset(data.keys())
     # check data contains not more than possible keys
@@ -561,7 +748,10 @@ def _check_format(header, data):
 
 
 def _reformat(header, data, verbose=0):
-    """updating header and data and check consistency"""
+    """updating header and data and check consistency
+
+    'data' can be None, then only the header is updated
+    """
 
     if verbose:
         print("startin reformatting ... ", end="", flush=True)
@@ -580,7 +770,7 @@ def _reformat(header, data, verbose=0):
                 "W_SF": header["model-parameters"].pop("W_SF"),
             }
 
-        if "paths" in data and isinstance(data["paths"], tuple):
+        if data is not None and "paths" in data and isinstance(data["paths"], tuple):
             new_paths = {}
             new_paths["reached point"] = data["paths"][0]
             new_paths["next point index"] = data["paths"][1]
@@ -594,16 +784,35 @@ def _reformat(header, data, verbose=0):
 
     # 0.2 add paths-lake if paths is given in data
     if header["aws-version-info"] < (0, 2):
-        if "paths" in data and not "paths-lake" in data:
+        if data is not None and "paths" in data and not "paths-lake" in data:
             data["paths-lake"] = np.array([])
 
     # 0.3 add computation-status
     if header["aws-version-info"] < (0, 3):
         header["computation-status"] = ""  # everything ran through
 
-        # always at the last step
-        # set the new version-info
-        header["aws-version-info"] = __version_info__
+    # 0.4 only the file format changed, which is taken care of by save_result_file
+
+    # 0.5 add region-volumes, they can be counted only if data is given
+    if header["aws-version-info"] < (0, 5):
+        header["region-volumes"] = None if data is None else region_volumes(data["states"], weights=_data_weights(data))
+
+    # 0.6 add profile, older files haven't been profiled
+    if header["aws-version-info"] < (0, 6):
+        header["profile"] = None
+
+    # 0.7 add equilibria, they depend on the parameters only but are not recomputed here
+    if header["aws-version-info"] < (0, 7):
+        header["equilibria"] = None
+
+    # 0.8 add finished, for older files it's unknown whether an empty
+    # computation-status comes from a complete run or a very early checkpoint
+    if header["aws-version-info"] < (0, 8):
+        header["finished"] = None
+
+    # always at the last step
+    # set the new version-info
+    header["aws-version-info"] = __version_info__
 
     if verbose:
         print("checking consistency of new header and data ... ", end="", flush=True)
@@ -615,6 +824,262 @@ def _reformat(header, data, verbose=0):
     return header, data
 
 
+def cell_weights(grid_levels, dim):
+    """the volume of the cells of an adaptive grid relative to the cells of the coarse grid"""
+    return 2.0 ** (-dim * np.asarray(grid_levels, dtype=float))
+
+def _data_weights(data):
+    if "grid-levels" not in data:
+        return None
+    return cell_weights(data["grid-levels"], np.shape(data["grid"])[-1])
+
+# the key of the points with a negative state in the region volumes, i.e. the
+# ones that are still marked as known before an unfinished (or checkpointed)
+# computation; files saved before it was added don't have it
+UNFINISHED_VOLUME = "UNFINISHED"
+
+def region_volumes(states, weights=None):
+    """the number of points in each region (by name), counted with a single pass over 'states'
+
+    with 'weights' (e.g. the cell_weights of an adaptive grid) the weights are summed up instead;
+    the negative states are counted under UNFINISHED_VOLUME, so the volumes add up to the whole grid
+    """
+    states = np.asarray(states).ravel()
+    convert = int if weights is None else float
+    unfinished = 0
+    if states.size and states.min() < 0:
+        mask = (states >= 0)
+        states = states[mask]
+        if weights is not None:
+            weights = np.asarray(weights).ravel()
+            unfinished = np.sum(weights[~mask])
+            weights = weights[mask]
+        else:
+            unfinished = np.count_nonzero(~mask)
+    counts = np.bincount(states, weights=weights, minlength=len(lv.REGIONS))
+    volumes = {region: convert(counts[getattr(lv, region)]) for region in lv.REGIONS}
+    volumes[UNFINISHED_VOLUME] = convert(unfinished)
+    return volumes
+
+
+"""
+summaries of result files: the part of the header that is needed to compare
+runs (their parameters) and the region volumes; they are kept in a persistent
+index (SUMMARY_INDEX_FILE) in the directory of the files, so a file is only
+read again when it has changed
+"""
+SUMMARY_INDEX_FILE = ".ays-summary-index"
+SUMMARY_KEYS = ["model", "managements", "boundaries",
+                "grid-parameters", "model-parameters", "boundary-parameters",
+                "computation-status", "region-volumes"]
+
+
+def _file_fingerprint(fname):
+    stat = os.stat(fname)
+    return (stat.st_size, stat.st_mtime)
+
+def _load_summary_index(index_file):
+    try:
+        with open(index_file, "rb") as f:
+            return pickle.load(f)
+    except (IOError, EOFError, pickle.UnpicklingError):
+        return {}
+
+def _save_summary_index(index_file, index):
+    tmp_fname = "{}.{}.tmp".format(index_file, os.getpid())
+    try:
+        with open(tmp_fname, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_fname, index_file)
+    except IOError as e:
+        print("couldn't save the summary index {!r} ({}: {!s})".format(index_file, e.__class__.__name__, e))
+    finally:
+        if os.path.exists(tmp_fname):
+            os.remove(tmp_fname)
+
+def load_summary(fname, *, verbose=0):
+    """the summary (SUMMARY_KEYS of the header) of the result file 'fname', without using the index
+
+    only the header is read, unless the file has no 'region-volumes' yet
+    (i.e. its version is older than 0.5), then the states are counted
+    """
+    header = load_result_file(fname, header_only=True, auto_reformat=True, verbose=verbose)
+    if header["region-volumes"] is None:
+        _, data = load_result_file(fname, auto_reformat=True, verbose=verbose)
+        header["region-volumes"] = region_volumes(data["states"], weights=_data_weights(data))
+    return {key: header[key] for key in SUMMARY_KEYS}
+
+def _load_summary_job(fname):
+    return load_summary(fname)
+
+def load_summaries(fnames, *, processes=1, rebuild_index=False, verbose=0):
+    """the summaries of the result files 'fnames' (a list in the same order)
+
+    they are taken from the summary index in the directory of each file and
+    only new or changed files (all files with 'rebuild_index') are read and
+    added to the index; these are read by 'processes' worker processes, each
+    of them keeps only one file at a time and returns only its summary
+    """
+    summaries = {}
+    indices = {}
+    stale = []
+    for fname in fnames:
+        directory = os.path.dirname(os.path.abspath(fname))
+        if directory not in indices:
+            indices[directory] = _load_summary_index(os.path.join(directory, SUMMARY_INDEX_FILE))
+        index = indices[directory]
+        key = os.path.basename(fname)
+        fingerprint = _file_fingerprint(fname)
+        if not rebuild_index and key in index and index[key][0] == fingerprint:
+            summaries[fname] = index[key][1]
+        else:
+            stale.append((directory, fname, fingerprint))
+    if verbose:
+        print("{} of {} summaries taken from the index".format(len(fnames) - len(stale), len(fnames)))
+
+    stale_fnames = [fname for _, fname, _ in stale]
+    processes = min(processes, len(stale_fnames))
+    if processes > 1:
+        with mp.Pool(processes=processes) as pool:
+            # chunksize 1, so every worker holds only one file at a time
+            stale_summaries = pool.map(_load_summary_job, stale_fnames, chunksize=1)
+    else:
+        stale_summaries = [load_summary(fname, verbose=verbose) for fname in stale_fnames]
+
+    for (directory, fname, fingerprint), summary in zip(stale, stale_summaries):
+        summaries[fname] = summary
+        indices[directory][os.path.basename(fname)] = (fingerprint, summary)
+    for directory in set(directory for directory, _, _ in stale):
+        _save_summary_index(os.path.join(directory, SUMMARY_INDEX_FILE), indices[directory])
+    return [summaries[fname] for fname in fnames]
+
+
+"""
+profiles of the computations: the time, run function evaluations and memory
+of each topology step, stored as 'profile' in the header (aws-file version 0.6)
+"""
+PROFILE_COUNTERS = ["wall-time", "cpu-time", "evaluations", "evaluation-time"]
+
+
+def peak_rss():
+    """the peak resident set size of this process (so far) in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on mac os
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def new_profile():
+    """an empty profile, see 'profile' in the header (aws-file version 0.6)
+
+    'steps' maps the topology steps (in the order they ran) to the counters
+    in PROFILE_COUNTERS and the peak memory ('peak-rss', in bytes) at the end
+    of the step (only filled with 'ays_tsm.py --profile'), 'wall-time', 'cpu-time' and 'peak-rss' are the totals and
+    'integrated-fraction' is the fraction of the points the hybrid run
+    functions had to integrate (None if they weren't used)
+    """
+    return {"steps": {}, "wall-time": 0., "cpu-time": 0., "peak-rss": 0, "integrated-fraction": None}
+
+
+def profile_step(profile, step):
+    """the counters of 'step' in 'profile' (created if necessary)"""
+    if step not in profile["steps"]:
+        profile["steps"][step] = dict.fromkeys(PROFILE_COUNTERS, 0)
+        profile["steps"][step]["peak-rss"] = 0
+    return profile["steps"][step]
+
+
+def _format_bytes(num):
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if num < 1024:
+            break
+        num /= 1024
+    return "{:.1f} {}".format(num, unit)
+
+
+def print_profile(profile):
+    """print the table of the topology steps in 'profile'
+
+    'other' is the wall time that is not spent evaluating the run functions,
+    i.e. mostly the neighbour searches and bookkeeping of pyviability
+    """
+    line = "{:<15s} {:>10s} {:>10s} {:>12s} {:>12s} {:>10s} {:>7s} {:>11s}"
+    print(line.format("step", "wall [s]", "cpu [s]", "evaluations", "eval [s]", "other [s]", "share", "peak rss"))
+    total = profile["wall-time"] or 1.  # avoid division by zero for dry runs
+    for step, counters in profile["steps"].items():
+        print("{:<15s} {:10.3f} {:10.3f} {:12d} {:12.3f} {:10.3f} {:7.1%} {:>11s}".format(
+            step, counters["wall-time"], counters["cpu-time"], counters["evaluations"],
+            counters["evaluation-time"], counters["wall-time"] - counters["evaluation-time"],
+            counters["wall-time"] / total, _format_bytes(counters["peak-rss"])))
+    print("{:<15s} {:10.3f} {:10.3f} {:>12s} {:>12s} {:>10s} {:>7s} {:>11s}".format(
+        "total", profile["wall-time"], profile["cpu-time"], "", "", "", "", _format_bytes(profile["peak-rss"])))
+    if not profile["steps"]:
+        print("(the topology steps are timed with 'ays_tsm.py --profile' only)")
+    if profile.get("integrated-fraction") is not None:
+        print("integrated by the hybrid run functions: {:.1%} of the points".format(profile["integrated-fraction"]))
+
+
+DEFAULT_CACHE_DIR = os.environ.get("AYS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ays-model"))
+DEFAULT_CACHE_SIZE = 2**30  # bytes
+
+def cache_key(*arrays, **parameters):
+    """hash the contents of 'arrays' and the values of 'parameters' into a key for the cache"""
+    h = hashlib.sha1()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update("{}{}".format(arr.dtype.str, arr.shape).encode())
+        h.update(arr.view(np.uint8).reshape(-1) if arr.size else b"")
+    for key in sorted(parameters):
+        val = parameters[key]
+        if isinstance(val, np.ndarray):
+            val = val.tolist()
+        h.update("{}={!r};".format(key, val).encode())
+    return h.hexdigest()
+
+def _cache_file(key, cache_dir):
+    return os.path.join(cache_dir, key + ".npy")
+
+def load_cached_array(key, *, cache_dir=DEFAULT_CACHE_DIR):
+    """return the array stored for 'key' in 'cache_dir' or None if there is none"""
+    fname = _cache_file(key, cache_dir)
+    try:
+        arr = np.load(fname)
+    except (IOError, OSError, ValueError):
+        return None
+    os.utime(fname)  # mark as recently used
+    return arr
+
+def save_cached_array(key, arr, *, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):
+    """store 'arr' for 'key' in 'cache_dir' and remove the least recently used
+    entries until the cache is not larger than 'max_size' bytes"""
+    os.makedirs(cache_dir, exist_ok=True)
+    fname = _cache_file(key, cache_dir)
+    tmp_fname = "{}.{}.tmp".format(fname, os.getpid())
+    with open(tmp_fname, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp_fname, fname)
+
+    entries = []
+    for entry in os.listdir(cache_dir):
+        if entry.endswith(".npy"):
+            path = os.path.join(cache_dir, entry)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # removed in the meantime
+            entries.append((stat.st_mtime, stat.st_size, path))
+    cache_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if cache_size <= max_size:
+            break
+        if path == fname:
+            continue  # never evict what has just been stored
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        cache_size -= size
+
+
 ALL_SIGNALS = { x: getattr(signal, x)  for x in dir(signal)
                if x.startswith("SIG")
                and not x.startswith("SIG_")  # because they are just duplicates
@@ -627,6 +1092,19 @@ NUMBER_TO_SIGNAL = { val: key for key, val in ALL_SIGNALS.items() }
 def signal_handler(sig, frame):
     sys.exit(sig)
 
+def register_periodic_handler(interval, handler):
+    """
+    call 'handler(sig, frame)' every 'interval' seconds (using SIGALRM)
+    interval:   (float) time between two calls in seconds, a value <= 0 stops the calls
+    handler:    (function) the signal handler to be called
+    note that this overrides a handler registered for SIGALRM by register_signals
+    """
+    if interval <= 0:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        return
+    signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, interval, interval)
+
 def register_signals(sigs = set(ALL_SIGNALS), handler=signal_handler, verbose=True):
     """
     register a signal handler for all given signals
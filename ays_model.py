@@ -3,8 +3,11 @@ from __future__ import division, print_function
 
 from ays_general import __version__, __version_info__
 import pyviability as pv
+from pyviability import helper
 
 import numpy as np
+import scipy.integrate as integ
+import functools as ft
 import warnings as warn
 import sys
 
@@ -28,7 +31,9 @@ if USING_NUMBA:
 
 if USING_NUMBA:
     jit = nb.jit
+    prange = nb.prange
 else:
+    prange = range
     def dummy_decorator_with_args(*args, **kwargs):
         if args and callable(args[0]):
             return args[0]
@@ -109,6 +114,97 @@ grid_parameters["boundaries"][:2, 0] = grid_parameters["boundaries"][:2, 0] + bo
 grid_parameters["boundaries"][:2, 1] = grid_parameters["boundaries"][:2, 1] - border_epsilon
 
 
+# the rescaling constants are passed to the rescaled rhs explicitly (after the
+# model parameters) so one compiled kernel serves every grid rescaling
+RESCALING_PARAMETERS = ("A_mid", "W_mid", "S_mid")
+
+
+def get_rescaled_parameters(model_parameters, grid_parameters):
+    """ordered parameters for AYS_rescaled_rhs, i.e. the ones of _AYS_rhs followed by the rescaling constants"""
+    return helper.get_ordered_parameters(_AYS_rhs, model_parameters) + \
+        tuple(grid_parameters[key] for key in RESCALING_PARAMETERS)
+
+
+# the number of (management, parameters, rescaling) combinations kept by the caches below
+RUN_FUNCTION_CACHE_SIZE = 256
+
+
+def _frozen(value):
+    """a hashable version of 'value' (dicts, lists and arrays become tuples)"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _frozen(val)) for key, val in value.items()))
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, tuple(value.ravel().tolist()))
+    if isinstance(value, (list, tuple)):
+        return tuple(map(_frozen, value))
+    return value
+
+
+def _thawed(value):
+    """the inverse of _frozen for the arrays"""
+    if isinstance(value, tuple) and len(value) == 3 and value[0] == "ndarray":
+        return np.array(value[2]).reshape(value[1])
+    return value
+
+
+@ft.lru_cache(maxsize=RUN_FUNCTION_CACHE_SIZE)
+def _cached_management_parameters(management, frozen_model_parameters, rescaling):
+    management_dict = get_management_parameter_dict(management, dict(frozen_model_parameters))
+    return get_rescaled_parameters(management_dict, dict(zip(RESCALING_PARAMETERS, rescaling)))
+
+
+def get_management_parameters(management, model_parameters, grid_parameters):
+    """the ordered parameters of AYS_rescaled_rhs for 'management' (see get_rescaled_parameters)
+
+    they are cached (LRU) on the management, the values of 'model_parameters'
+    and the rescaling constants in 'grid_parameters'; see run_function_cache_info
+    """
+    return _cached_management_parameters(management, _frozen(model_parameters),
+                                         tuple(grid_parameters[key] for key in RESCALING_PARAMETERS))
+
+
+@ft.lru_cache(maxsize=RUN_FUNCTION_CACHE_SIZE)
+def _cached_management_run(management, frozen_model_parameters, rescaling, frozen_offset, frozen_scaling_vector, run_kwargs):
+    ordered_parameters = _cached_management_parameters(management, frozen_model_parameters, rescaling)
+    offset, scaling_vector = _thawed(frozen_offset), _thawed(frozen_scaling_vector)
+    run_kwargs = dict(run_kwargs)
+    if run_kwargs.pop("coordinates", "compactified") == "log":
+        return make_log_run(ordered_parameters, offset, scaling_vector, **run_kwargs)
+    if run_kwargs.get("returning") == "integration":
+        # own version, so odeint can use the analytic Jacobian
+        return make_integration_run(ordered_parameters, offset, scaling_vector)
+    if run_kwargs.get("returning") == "hybrid":
+        del run_kwargs["returning"]
+        return make_hybrid_run(ordered_parameters, offset, scaling_vector, **run_kwargs)
+    return pv.make_run_function(AYS_rescaled_rhs, ordered_parameters, offset, scaling_vector, **run_kwargs)
+
+
+def get_management_run(management, model_parameters, grid_parameters, offset, scaling_vector, **run_kwargs):
+    """the run function (pyviability.make_run_function) of AYS_rescaled_rhs for 'management'
+
+    with returning="integration" it's make_integration_run, using the analytic Jacobian,
+    with returning="hybrid" make_hybrid_run and with coordinates="log" make_log_run;
+    note that the statistics of cached hybrid run functions add up
+
+    like get_management_parameters it is cached, additionally on 'offset',
+    'scaling_vector' and the keyword arguments of make_run_function
+    """
+    return _cached_management_run(management, _frozen(model_parameters),
+                                  tuple(grid_parameters[key] for key in RESCALING_PARAMETERS),
+                                  _frozen(offset), _frozen(scaling_vector), _frozen(run_kwargs))
+
+
+def run_function_cache_info():
+    """hits, misses, maxsize and currsize of the caches of the ordered parameters and the run functions"""
+    return {"parameters": _cached_management_parameters.cache_info(),
+            "run-functions": _cached_management_run.cache_info()}
+
+
+def clear_run_function_caches():
+    _cached_management_parameters.cache_clear()
+    _cached_management_run.cache_clear()
+
+
 def globalize_dictionary(dictionary, module="__main__"):
     if isinstance(module, str):
         module = sys.modules[module]
@@ -132,15 +228,35 @@ def _AYS_rhs(AYS, t=0, beta=None, epsilon=None, phi=None, rho=None, sigma=None,
     return Adot, Wdot, Sdot
 
 
-AYS_rhs = nb.jit(_AYS_rhs, nopython=NB_USING_NOPYTHON)
+AYS_rhs = nb.jit(_AYS_rhs, nopython=NB_USING_NOPYTHON, cache=True)
 # AYS_rhs = _AYS_rhs  # used for debugging
 
 
-@jit(nopython=NB_USING_NOPYTHON)
-def AYS_rescaled_rhs(ays, t=0, beta=None, epsilon=None, phi=None, rho=None, sigma=None, tau_A=None, tau_S=None, theta=None):
-    a, y, s = ays
-    # A, y, s = Ays
-
+def _AYS_jacobian(AYS, t=0, beta=None, epsilon=None, phi=None, rho=None, sigma=None, tau_A=None, tau_S=None, theta=None):
+    """the analytic Jacobian of _AYS_rhs (same arguments) as a (3, 3) array"""
+    A, W, S = AYS
+    U = W / epsilon
+    G = 1 / (1 + (S/sigma)**rho)
+    # F = U * G
+    dG = - rho * (S/sigma)**(rho - 1) / sigma * G * G
+    jac = np.empty((3, 3))
+    jac[0, 0] = - 1 / tau_A
+    jac[0, 1] = G / (epsilon * phi)
+    jac[0, 2] = U * dG / phi
+    jac[1, 0] = - theta * W
+    jac[1, 1] = beta - theta * A
+    jac[1, 2] = 0.
+    jac[2, 0] = 0.
+    jac[2, 1] = (1 - G) / epsilon
+    jac[2, 2] = - U * dG - 1 / tau_S
+    return jac
+
+
+AYS_jacobian = jit(_AYS_jacobian, nopython=NB_USING_NOPYTHON, cache=True)
+
+
+@jit(nopython=NB_USING_NOPYTHON, cache=True)
+def _AYS_rescaled_rhs_point(a, y, s, beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid):
     s_inv = 1 - s
     s_inv_rho = s_inv ** rho
     K = s_inv_rho / (s_inv_rho + (S_mid * s / sigma) ** rho )
@@ -156,6 +272,434 @@ def AYS_rescaled_rhs(ays, t=0, beta=None, epsilon=None, phi=None, rho=None, sigm
     return adot, ydot, sdot
 
 
+@jit(nopython=NB_USING_NOPYTHON, cache=True)
+def AYS_rescaled_rhs(ays, t=0, beta=None, epsilon=None, phi=None, rho=None, sigma=None, tau_A=None, tau_S=None, theta=None,
+                     A_mid=None, W_mid=None, S_mid=None):
+    a, y, s = ays
+    # A, y, s = Ays
+    return _AYS_rescaled_rhs_point(a, y, s, beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+
+
+@jit(nopython=NB_USING_NOPYTHON, parallel=USING_NUMBA, cache=True)
+def AYS_rescaled_rhs_batch(ays, t=0, beta=None, epsilon=None, phi=None, rho=None, sigma=None, tau_A=None, tau_S=None, theta=None,
+                           A_mid=None, W_mid=None, S_mid=None):
+    """evaluate AYS_rescaled_rhs for all points of an (N, 3) array at once
+
+    takes the same ordered parameters as AYS_rescaled_rhs and returns an (N, 3) array of the derivatives
+    """
+    num = ays.shape[0]
+    ays_dot = np.empty((num, 3))
+    for i in prange(num):
+        adot, ydot, sdot = _AYS_rescaled_rhs_point(ays[i, 0], ays[i, 1], ays[i, 2],
+                                                   beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta,
+                                                   A_mid, W_mid, S_mid)
+        ays_dot[i, 0] = adot
+        ays_dot[i, 1] = ydot
+        ays_dot[i, 2] = sdot
+    return ays_dot
+
+
+@jit(nopython=NB_USING_NOPYTHON, parallel=USING_NUMBA, cache=True)
+def AYS_rescaled_rk4(ays0, times, substeps, beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid):
+    """integrate AYS_rescaled_rhs with a fixed step Runge-Kutta (4th order) method
+
+    all initial conditions of the (N, 3) array 'ays0' are integrated at once,
+    with 'substeps' steps between two of the output 'times', and an array of
+    shape (N, len(times), 3) is returned
+    """
+    num = ays0.shape[0]
+    num_times = times.shape[0]
+    traj = np.empty((num, num_times, 3))
+    for i in prange(num):
+        a, y, s = ays0[i, 0], ays0[i, 1], ays0[i, 2]
+        traj[i, 0, 0] = a
+        traj[i, 0, 1] = y
+        traj[i, 0, 2] = s
+        for j in range(1, num_times):
+            h = (times[j] - times[j - 1]) / substeps
+            for _ in range(substeps):
+                a1, y1, s1 = _AYS_rescaled_rhs_point(a, y, s,
+                                                     beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+                a2, y2, s2 = _AYS_rescaled_rhs_point(a + h / 2 * a1, y + h / 2 * y1, s + h / 2 * s1,
+                                                     beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+                a3, y3, s3 = _AYS_rescaled_rhs_point(a + h / 2 * a2, y + h / 2 * y2, s + h / 2 * s2,
+                                                     beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+                a4, y4, s4 = _AYS_rescaled_rhs_point(a + h * a3, y + h * y3, s + h * s3,
+                                                     beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+                a += h / 6 * (a1 + 2 * a2 + 2 * a3 + a4)
+                y += h / 6 * (y1 + 2 * y2 + 2 * y3 + y4)
+                s += h / 6 * (s1 + 2 * s2 + 2 * s3 + s4)
+            traj[i, j, 0] = a
+            traj[i, j, 1] = y
+            traj[i, j, 2] = s
+    return traj
+
+
+@jit(nopython=NB_USING_NOPYTHON, cache=True)
+def _AYS_rescaled_jacobian_point(a, y, s, beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid):
+    """the Jacobian of _AYS_rescaled_rhs_point at (a, y, s) as a (3, 3) array"""
+    s_inv = 1 - s
+    s_inv_rho = s_inv ** rho
+    Q = (S_mid * s / sigma) ** rho
+    K = s_inv_rho / (s_inv_rho + Q)
+    # d/ds of s_inv_rho and Q
+    ds_s_inv_rho = - rho * s_inv ** (rho - 1)
+    dQ = rho * (S_mid / sigma) ** rho * s ** (rho - 1)
+    dK = (ds_s_inv_rho * Q - s_inv_rho * dQ) / (s_inv_rho + Q) ** 2
+
+    a_inv = 1 - a
+    w_inv = 1 - y
+    Y = W_mid * y / w_inv
+    dY = W_mid / (w_inv * w_inv)
+    A = A_mid * a / a_inv
+    dA = A_mid / (a_inv * a_inv)
+    c_a = 1 / (phi * epsilon * A_mid)
+    c_s = 1 / (epsilon * S_mid)
+
+    jac = np.empty((3, 3))
+    jac[0, 0] = - 2 * c_a * K * a_inv * Y - (1 - 2 * a) / tau_A
+    jac[0, 1] = c_a * K * a_inv * a_inv * dY
+    jac[0, 2] = c_a * dK * a_inv * a_inv * Y
+    jac[1, 0] = - y * w_inv * theta * dA
+    jac[1, 1] = (1 - 2 * y) * (beta - theta * A)
+    jac[1, 2] = 0.
+    jac[2, 0] = 0.
+    jac[2, 1] = c_s * (1 - K) * s_inv * s_inv * dY
+    jac[2, 2] = c_s * (- dK * s_inv * s_inv - 2 * (1 - K) * s_inv) * Y - (1 - 2 * s) / tau_S
+    return jac
+
+
+@jit(nopython=NB_USING_NOPYTHON, cache=True)
+def AYS_rescaled_jacobian(ays, t=0, beta=None, epsilon=None, phi=None, rho=None, sigma=None, tau_A=None, tau_S=None, theta=None,
+                          A_mid=None, W_mid=None, S_mid=None):
+    """the analytic Jacobian of AYS_rescaled_rhs (same arguments), a (3, 3) array"""
+    return _AYS_rescaled_jacobian_point(ays[0], ays[1], ays[2],
+                                        beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+
+
+@jit(nopython=NB_USING_NOPYTHON, parallel=USING_NUMBA, cache=True)
+def AYS_rescaled_newton(ays0, max_iter, tol, beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid):
+    """solve AYS_rescaled_rhs = 0 with a damped Newton iteration for all starting points of the (N, 3) array 'ays0'
+
+    the iterates are kept inside of the unit cube (but away from 1, which
+    corresponds to infinity in the original coordinates) and the step is halved
+    until the residual decreases; returns the (N, 3) array of the final
+    points and a boolean (N,) array telling which ones have converged, i.e.
+    the maximum norm of the rhs fell below 'tol' within 'max_iter' steps
+    """
+    num = ays0.shape[0]
+    roots = np.empty((num, 3))
+    converged = np.zeros(num, dtype=np.bool_)
+    upper = 1. - 1e-9
+    for i in prange(num):
+        a, y, s = ays0[i, 0], ays0[i, 1], ays0[i, 2]
+        f0, f1, f2 = _AYS_rescaled_rhs_point(a, y, s, beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+        residual = max(abs(f0), abs(f1), abs(f2))
+        for _ in range(max_iter):
+            if not residual >= tol:  # also stops for nan
+                break
+            jac = _AYS_rescaled_jacobian_point(a, y, s, beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+            # solve jac @ d = f with Cramer's rule
+            det = jac[0, 0] * (jac[1, 1] * jac[2, 2] - jac[1, 2] * jac[2, 1]) \
+                - jac[0, 1] * (jac[1, 0] * jac[2, 2] - jac[1, 2] * jac[2, 0]) \
+                + jac[0, 2] * (jac[1, 0] * jac[2, 1] - jac[1, 1] * jac[2, 0])
+            if not abs(det) > 0:
+                break
+            d0 = (f0 * (jac[1, 1] * jac[2, 2] - jac[1, 2] * jac[2, 1])
+                  - jac[0, 1] * (f1 * jac[2, 2] - jac[1, 2] * f2)
+                  + jac[0, 2] * (f1 * jac[2, 1] - jac[1, 1] * f2)) / det
+            d1 = (jac[0, 0] * (f1 * jac[2, 2] - jac[1, 2] * f2)
+                  - f0 * (jac[1, 0] * jac[2, 2] - jac[1, 2] * jac[2, 0])
+                  + jac[0, 2] * (jac[1, 0] * f2 - f1 * jac[2, 0])) / det
+            d2 = (jac[0, 0] * (jac[1, 1] * f2 - f1 * jac[2, 1])
+                  - jac[0, 1] * (jac[1, 0] * f2 - f1 * jac[2, 0])
+                  + f0 * (jac[1, 0] * jac[2, 1] - jac[1, 1] * jac[2, 0])) / det
+            step = 1.
+            while step > 1e-3:
+                a_new = min(max(a - step * d0, 0.), upper)
+                y_new = min(max(y - step * d1, 0.), upper)
+                s_new = min(max(s - step * d2, 0.), upper)
+                g0, g1, g2 = _AYS_rescaled_rhs_point(a_new, y_new, s_new,
+                                                     beta, epsilon, phi, rho, sigma, tau_A, tau_S, theta, A_mid, W_mid, S_mid)
+                new_residual = max(abs(g0), abs(g1), abs(g2))
+                if new_residual < residual:
+                    a, y, s = a_new, y_new, s_new
+                    f0, f1, f2 = g0, g1, g2
+                    residual = new_residual
+                    break
+                step /= 2
+            if step <= 1e-3:
+                break  # the residual didn't decrease, stuck
+        roots[i, 0] = a
+        roots[i, 1] = y
+        roots[i, 2] = s
+        converged[i] = residual < tol
+    return roots, converged
+
+
+EQUILIBRIUM_STARTS = 8  # per dimension, i.e. 8**3 starting points
+EQUILIBRIUM_TOLERANCE = 1e-12  # maximum norm of the rhs
+EQUILIBRIUM_DISTANCE = 1e-6  # closer roots are considered to be the same
+EIGENVALUE_TOLERANCE = 1e-9  # relative to the norm of the Jacobian, smaller real parts count as zero
+
+
+def find_equilibria(parameters, *, num_starts=EQUILIBRIUM_STARTS, max_iter=100, tol=EQUILIBRIUM_TOLERANCE,
+                    distance=EQUILIBRIUM_DISTANCE, eigenvalue_tolerance=EIGENVALUE_TOLERANCE):
+    """find the fixed points of AYS_rescaled_rhs in the unit cube
+
+    'parameters' are the ordered parameters (see get_management_parameters),
+    Newton's method is started from the centers of 'num_starts'**3 cells
+    covering the unit cube, the roots closer than 'distance' are merged and
+    classified by the eigenvalues of the Jacobian; 'tol' is the tolerance of
+    the residual, while an eigenvalue counts as having a zero real part if it
+    is within 'eigenvalue_tolerance' times the (spectral) norm of the Jacobian
+
+    returns a list of dictionaries with the 'point' (a, y, s), the
+    'residual' (maximum norm of the rhs there), the 'eigenvalues' and the
+    'stability' ("stable", "unstable", "saddle" or "non-hyperbolic"), sorted
+    by the point
+    """
+    x = (np.arange(num_starts) + 0.5) / num_starts
+    starts = np.stack(np.meshgrid(x, x, x, indexing="ij"), axis=-1).reshape(-1, 3)
+    roots, converged = AYS_rescaled_newton(starts, max_iter, tol, *parameters)
+
+    unique = []
+    for root in roots[converged]:
+        if not any(np.max(np.abs(root - other)) < distance for other in unique):
+            unique.append(root)
+
+    points = np.array(sorted(unique, key=lambda root: tuple(np.round(root, 6)))).reshape(-1, 3)
+    residuals = np.max(np.abs(AYS_rescaled_rhs_batch(points, 0., *parameters)), axis=-1)
+
+    equilibria = []
+    for root, residual in zip(points, residuals):
+        jacobian = AYS_rescaled_jacobian(root, 0., *parameters)
+        eigenvalues = np.linalg.eigvals(jacobian)
+        real = eigenvalues.real
+        if np.any(np.abs(real) <= eigenvalue_tolerance * np.linalg.norm(jacobian, ord=2)):
+            stability = "non-hyperbolic"
+        elif np.all(real < 0):
+            stability = "stable"
+        elif np.all(real > 0):
+            stability = "unstable"
+        else:
+            stability = "saddle"
+        equilibria.append({"point": root, "residual": residual, "eigenvalues": eigenvalues, "stability": stability})
+    return equilibria
+
+
+# like in pyviability, added to the norm when normalizing the rhs to unit speed
+RUN_NORMALIZATION_EPSILON = 1e-6
+
+
+def _normalized_grid_rhs(ordered_parameters, offset, scaling_vector, rhs, jacobian):
+    """'rhs' and 'jacobian' transformed to the grid coordinates and normalized to unit speed
+
+    both have to be jitted functions (if numba is used)
+    """
+    offset = np.asarray(offset, dtype=float)
+    scaling = np.asarray(scaling_vector, dtype=float)
+    scaling_inv = np.linalg.inv(scaling)
+    eps = RUN_NORMALIZATION_EPSILON
+
+    def normalized_rhs(x, t):
+        val = scaling_inv @ np.asarray(rhs(offset + scaling @ x, t, *ordered_parameters))
+        return val / (np.sqrt(np.sum(val**2)) + eps)
+
+    def normalized_jacobian(x, t):
+        point = offset + scaling @ x
+        val = scaling_inv @ np.asarray(rhs(point, t, *ordered_parameters))
+        jac = scaling_inv @ jacobian(point, t, *ordered_parameters) @ scaling
+        norm = np.sqrt(np.sum(val**2))
+        # d/dx val / (|val| + eps) = jac / (|val| + eps) - val (val @ jac) / (|val| (|val| + eps)**2)
+        return jac / (norm + eps) - np.outer(val, val @ jac) / (max(norm, eps) * (norm + eps)**2)
+
+    # jitted like the normalized rhs of pyviability.make_run_function, odeint calls them at every step
+    normalized_rhs = jit(normalized_rhs, nopython=NB_USING_NOPYTHON)
+    if jacobian is None:
+        return normalized_rhs, None
+    return normalized_rhs, jit(normalized_jacobian, nopython=NB_USING_NOPYTHON)
+
+
+def make_integration_run(ordered_parameters, offset, scaling_vector, *,
+                         rhs=AYS_rescaled_rhs, jacobian=AYS_rescaled_jacobian):
+    """a run function for pyviability.topology_classification, integrating 'rhs' with odeint
+
+    like the ones of pyviability.make_run_function(..., returning="integration"),
+    the rhs is transformed to the grid coordinates (the unit cube, see
+    'offset' and 'scaling_vector') and normalized to unit speed, so
+    'run(x, stepsize)' follows the trajectory through 'x' for the distance
+    'stepsize'; the analytic 'jacobian' (with the arguments of 'rhs') is
+    transformed alike and passed to odeint as Dfun, None leaves it to odeint
+    to approximate the Jacobian by finite differences
+    """
+    normalized_rhs, Dfun = _normalized_grid_rhs(ordered_parameters, offset, scaling_vector, rhs, jacobian)
+
+    def integration_run(x, stepsize):
+        return integ.odeint(normalized_rhs, x, [0, stepsize], Dfun=Dfun)[-1]
+
+    return integration_run
+
+
+HYBRID_TOLERANCE = 0.1  # local error relative to the stepsize
+
+
+def make_hybrid_run(ordered_parameters, offset, scaling_vector, *, tolerance=HYBRID_TOLERANCE):
+    """a run function that integrates only where the linear approximation is not good enough
+
+    each point takes the linear step of the unit-speed flow in the grid
+    coordinates (see make_integration_run) first; the difference to Heun's
+    (second order) step estimates its local error, and if it is at most
+    'tolerance' * stepsize, Heun's step is returned, otherwise (or if the
+    linear or Heun's step leaves the unit cube) the point is integrated
+
+    the number of points of both kinds is counted in the dictionary
+    'run.statistics' ("linear" and "integrated"), see integrated_fraction
+    """
+    normalized_rhs, _ = _normalized_grid_rhs(ordered_parameters, offset, scaling_vector, AYS_rescaled_rhs, None)
+    integration_run = make_integration_run(ordered_parameters, offset, scaling_vector)
+    statistics = {"linear": 0, "integrated": 0}
+
+    @jit(nopython=NB_USING_NOPYTHON)
+    def heun_step(x, stepsize):
+        """Heun's step and whether it is accurate enough"""
+        f1 = normalized_rhs(x, 0.)
+        x_linear = x + stepsize * f1
+        if np.any(x_linear < 0) or np.any(x_linear > 1):
+            return x_linear, False
+        f2 = normalized_rhs(x_linear, 0.)
+        x_heun = x + stepsize / 2 * (f1 + f2)
+        if np.any(x_heun < 0) or np.any(x_heun > 1):
+            return x_heun, False
+        # |x_linear - x_heun| / stepsize
+        return x_heun, np.sqrt(np.sum((f2 - f1)**2)) / 2 <= tolerance
+
+    def hybrid_run(x, stepsize):
+        x_heun, accurate = heun_step(x, stepsize)
+        if accurate:
+            statistics["linear"] += 1
+            return x_heun
+        statistics["integrated"] += 1
+        return integration_run(x, stepsize)
+
+    hybrid_run.statistics = statistics
+    return hybrid_run
+
+
+def integrated_fraction(run_functions):
+    """the fraction of the points the hybrid 'run_functions' (see make_hybrid_run) had to integrate
+
+    None if there are no hybrid run functions or they haven't been called
+    """
+    statistics = [run.statistics for run in run_functions if hasattr(run, "statistics")]
+    integrated = sum(stat["integrated"] for stat in statistics)
+    total = integrated + sum(stat["linear"] for stat in statistics)
+    return integrated / total if total else None
+
+
+###############################################################################
+# log coordinates (A, log W, log S)
+###############################################################################
+
+COORDINATES = ["compactified", "log"]
+
+
+@jit(nopython=NB_USING_NOPYTHON, cache=True)
+def AYS_log_rhs(x, t=0, beta=None, epsilon=None, phi=None, rho=None, sigma=None, tau_A=None, tau_S=None, theta=None):
+    """_AYS_rhs in the coordinates (A, log W, log S)
+
+    W and S growing (or decaying) exponentially becomes linear, and S = 0
+    (log S = -infinity) needs no special treatment for rho > 1
+    """
+    A, u, v = x[0], x[1], x[2]
+    G = 1 / (1 + np.exp(rho * (v - np.log(sigma))))  # 1 / (1 + (S/sigma)**rho)
+    H = np.exp(u + (rho - 1) * v - rho * np.log(sigma)) / epsilon  # W * S**(rho - 1) / (epsilon * sigma**rho)
+    Adot = np.exp(u) * G / (epsilon * phi) - A / tau_A
+    udot = beta - theta * A
+    vdot = H * G - 1 / tau_S
+    return Adot, udot, vdot
+
+
+@jit(nopython=NB_USING_NOPYTHON, cache=True)
+def AYS_log_jacobian(x, t=0, beta=None, epsilon=None, phi=None, rho=None, sigma=None, tau_A=None, tau_S=None, theta=None):
+    """the analytic Jacobian of AYS_log_rhs (same arguments) as a (3, 3) array"""
+    A, u, v = x[0], x[1], x[2]
+    G = 1 / (1 + np.exp(rho * (v - np.log(sigma))))
+    dG = - rho * G * (1 - G)
+    H = np.exp(u + (rho - 1) * v - rho * np.log(sigma)) / epsilon
+    jac = np.empty((3, 3))
+    jac[0, 0] = - 1 / tau_A
+    jac[0, 1] = np.exp(u) * G / (epsilon * phi)
+    jac[0, 2] = np.exp(u) * dG / (epsilon * phi)
+    jac[1, 0] = - theta
+    jac[1, 1] = 0.
+    jac[1, 2] = 0.
+    jac[2, 0] = 0.
+    jac[2, 1] = H * G
+    jac[2, 2] = (rho - 1) * H * G + H * dG
+    return jac
+
+
+def to_log_coordinates(ays, A_mid, W_mid, S_mid):
+    """map (a, y, s) of the compactified grid to (A, log W, log S), for single points and (N, 3) arrays"""
+    ays = np.asarray(ays, dtype=float)
+    a, y, s = ays[..., 0], ays[..., 1], ays[..., 2]
+    with np.errstate(divide="ignore"):
+        return np.stack([A_mid * a / (1 - a),
+                         np.log(W_mid) + np.log(y) - np.log1p(-y),
+                         np.log(S_mid) + np.log(s) - np.log1p(-s)], axis=-1)
+
+
+def from_log_coordinates(x, A_mid, W_mid, S_mid):
+    """the inverse of to_log_coordinates"""
+    x = np.asarray(x, dtype=float)
+    A, u, v = x[..., 0], x[..., 1], x[..., 2]
+    with np.errstate(over="ignore"):
+        return np.stack([A / (A + A_mid),
+                         1 / (1 + np.exp(np.log(W_mid) - u)),
+                         1 / (1 + np.exp(np.log(S_mid) - v))], axis=-1)
+
+
+def make_log_run(ordered_parameters, offset, scaling_vector, *, returning="integration", rtol=None, atol=None):
+    """a run function like make_integration_run, but integrating AYS_log_rhs in (A, log W, log S)
+
+    'ordered_parameters' are the ones of AYS_rescaled_rhs; a point of the
+    grid is transformed to the log coordinates, evolved for the time it takes
+    to move 'stepsize' with its initial speed in the grid coordinates, and
+    transformed back, so the result is comparable to the one of the
+    compactified run functions, 'returning' is "integration" (odeint with the
+    analytic Jacobian, 'rtol' and 'atol' are passed on) or "linear" (a single
+    Euler step in log coordinates)
+
+    points with W or S zero or infinite have no log coordinates, they are
+    integrated in the compactified coordinates (see make_integration_run)
+    """
+    if returning not in ["integration", "linear"]:
+        raise ValueError("unknown value for returning: {!r}".format(returning))
+    offset = np.asarray(offset, dtype=float)
+    scaling = np.asarray(scaling_vector, dtype=float)
+    scaling_inv = np.linalg.inv(scaling)
+    model_parameters = ordered_parameters[:-len(RESCALING_PARAMETERS)]
+    rescaling = ordered_parameters[-len(RESCALING_PARAMETERS):]
+    compactified_run = make_integration_run(ordered_parameters, offset, scaling_vector)
+
+    def log_run(x, stepsize):
+        ays = offset + scaling @ x
+        if not np.all((ays > 0) & (ays < 1)):
+            return compactified_run(x, stepsize)
+        speed = np.linalg.norm(scaling_inv @ np.asarray(AYS_rescaled_rhs(ays, 0., *ordered_parameters)))
+        duration = stepsize / (speed + RUN_NORMALIZATION_EPSILON)
+        log_point = to_log_coordinates(ays, *rescaling)
+        if returning == "integration":
+            log_point = integ.odeint(AYS_log_rhs, log_point, [0, duration], args=model_parameters,
+                                     Dfun=AYS_log_jacobian, rtol=rtol, atol=atol)[-1]
+        else:
+            log_point = log_point + duration * np.asarray(AYS_log_rhs(log_point, 0., *model_parameters))
+        return scaling_inv @ (from_log_coordinates(log_point, *rescaling) - offset)
+
+    return log_run
+
+
 # @jit(nopython=NB_USING_NOPYTHON)
 def AYS_sunny_PB(ays):
     return ays[:, 0] < A_PB / (A_PB + A_mid) # transformed A_PB  # planetary boundary
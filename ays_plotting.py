@@ -0,0 +1,250 @@
+# name of the code: ays_plotting.py
+"""the plotting helpers of the AYS scripts
+
+This module is kept apart from ays_general so that the compute and file
+handling scripts don't import matplotlib (and don't need a display backend).
+It is imported lazily by the wrappers in ays_general.
+"""
+
+from ays_general import compactification, inv_compactification, transformed_space, \
+    AZIMUTH, ELEVATION
+
+import functools as ft
+
+import matplotlib.pyplot as plt
+import mpl_toolkits.mplot3d as plt3d
+import matplotlib.ticker as ticker
+from matplotlib import animation
+
+import numpy as np
+import warnings as warn
+
+
+# patch to remove padding at ends of axes:
+###patch start###
+from mpl_toolkits.mplot3d.axis3d import Axis
+if not hasattr(Axis, "_get_coord_info_old"):
+    def _get_coord_info_new(self, renderer):
+        mins, maxs, centers, deltas, tc, highs = self._get_coord_info_old(renderer)
+        mins += deltas / 4
+        maxs -= deltas / 4
+        return mins, maxs, centers, deltas, tc, highs
+    Axis._get_coord_info_old = Axis._get_coord_info
+    Axis._get_coord_info = _get_coord_info_new
+###patch end###
+
+
+def animate(fig, ax3d, fname):
+    assert fname.endswith(".mp4"), "for now '.mp4' files for video only"
+    def turning_animation(i):
+        ax3d.view_init(ELEVATION, AZIMUTH + i)
+    # Animate
+    anim = animation.FuncAnimation(fig, turning_animation, 
+                                   init_func=init,
+                                   frames=360, interval=20, blit=True)
+    # Save
+    anim.save(fname, fps=30, extra_args=['-vcodec', 'libx264'])
+    # ax3d.view_init(ELEVATION, AZIMUTH)
+
+def create_figure(*bla, S_scale = 1e9, W_scale = 1e12, W_mid = None, S_mid = None, boundaries = None, transformed_formatters=False,
+                  num_a = 12, num_y = 12, num_s = 12, **kwargs):
+
+
+    kwargs = dict(kwargs)
+
+    if boundaries is None:
+        boundaries = [None]*3
+
+    fig = plt.figure(figsize=(16,9))
+    ax3d = plt3d.Axes3D(fig)
+    ax3d.set_xlabel("\n\nexcess atmospheric carbon\nstock A [GtC]")
+    ax3d.set_ylabel("\neconomic output Y [%1.0e USD/yr]"%W_scale)
+    ax3d.set_zlabel("\n\nrenewable knowledge\nstock S [%1.0e GJ]"%S_scale)
+
+    # make proper tickmarks:
+    if "A_max" in kwargs:
+        A_max = kwargs.pop("A_max")
+        Aticks = np.linspace(0,A_max,11)
+        ax3d.w_xaxis.set_major_locator(ticker.FixedLocator(Aticks))
+        ax3d.w_xaxis.set_major_formatter(ticker.FixedFormatter(Aticks.astype("int")))
+        if boundaries is None:
+            ax3d.set_xlim(Aticks[0],Aticks[-1])
+        else:
+            ax3d.set_xlim(*boundaries[0])
+    elif "A_mid" in kwargs:
+        A_mid = kwargs.pop("A_mid")
+        transf = ft.partial(compactification, x_mid=A_mid)
+        inv_transf = ft.partial(inv_compactification, x_mid=A_mid)
+
+        if boundaries[0] is None:
+            start, stop = 0, np.infty
+        else:
+            start, stop = inv_transf(boundaries[0])
+        formatters, locators = transformed_space(transf, inv_transf, axis_use=True, start=start, stop=stop, num=num_a)
+        if transformed_formatters:
+            new_formatters = []
+            for el, loc in zip(formatters, locators):
+                if el:
+                    new_formatters.append("{:4.2f}".format(loc))
+                else:
+                    new_formatters.append(el)
+            formatters = new_formatters
+        ax3d.w_xaxis.set_major_locator(ticker.FixedLocator(locators))
+        ax3d.w_xaxis.set_major_formatter(ticker.FixedFormatter(formatters))
+
+        if boundaries[0] is None:
+            ax3d.set_xlim(0,1)
+        else:
+            ax3d.set_xlim(*boundaries[0])
+
+    else:
+        raise KeyError("can't find proper key for 'A' in kwargs that determines which representation of 'A' has been used")
+
+    if kwargs:
+        warn.warn("omitted arguments: {}".format(", ".join(sorted(kwargs))), stacklevel=2)
+
+    transf = ft.partial(compactification, x_mid=W_mid)
+    inv_transf = ft.partial(inv_compactification, x_mid=W_mid)
+
+    if boundaries[1] is None:
+        start, stop = 0, np.infty
+    else:
+        start, stop = inv_transf(boundaries[1])
+    formatters, locators = transformed_space(transf, inv_transf, axis_use=True, scale=W_scale, start=start, stop=stop, num=num_y)
+    if transformed_formatters:
+        new_formatters = []
+        for el, loc in zip(formatters, locators):
+            if el:
+                new_formatters.append("{:4.2f}".format(loc))
+            else:
+                new_formatters.append(el)
+        formatters = new_formatters
+    ax3d.w_yaxis.set_major_locator(ticker.FixedLocator(locators))
+    ax3d.w_yaxis.set_major_formatter(ticker.FixedFormatter(formatters))
+
+    if boundaries[1] is None:
+        ax3d.set_ylim(0,1)
+    else:
+        ax3d.set_ylim(*boundaries[1])
+
+
+    transf = ft.partial(compactification, x_mid=S_mid)
+    inv_transf = ft.partial(inv_compactification, x_mid=S_mid)
+
+    if boundaries[2] is None:
+        start, stop = 0, np.infty
+    else:
+        start, stop = inv_transf(boundaries[2])
+    formatters, locators = transformed_space(transf, inv_transf, axis_use=True, scale=S_scale, start=start, stop=stop, num=num_s)
+    if transformed_formatters:
+        new_formatters = []
+        for el, loc in zip(formatters, locators):
+            if el:
+                new_formatters.append("{:4.2f}".format(loc))
+            else:
+                new_formatters.append(el)
+        formatters = new_formatters
+    ax3d.w_zaxis.set_major_locator(ticker.FixedLocator(locators))
+    ax3d.w_zaxis.set_major_formatter(ticker.FixedFormatter(formatters))
+
+    if boundaries[2] is None:
+        ax3d.set_zlim(0,1)
+    else:
+        ax3d.set_zlim(*boundaries[2])
+
+    ax3d.view_init(ELEVATION, AZIMUTH)
+
+    return fig, ax3d
+
+
+def add_boundary(ax3d, *, sunny_boundaries, add_outer=False, plot_boundaries=None, **parameters):
+# def add_boundary(ax3d, *, boundary = ["planetary-boundary"], add_outer=False, plot_boundaries=None, **parameters):
+    """show boundaries of desirable region"""
+
+    if not sunny_boundaries:
+        # nothing to do
+        return 
+
+    # get the boundaries of the plot (and check whether it's an old one where "A" wasn't transformed yet
+    if plot_boundaries is None:
+        if "A_max" in parameters:
+            a_min, a_max = 0, parameters["A_max"]
+        elif "A_mid" in parameters:
+            a_min, a_max = 0, 1
+        w_min, w_max = 0, 1
+        s_min, s_max = 0, 1
+    else:
+        a_min, a_max = plot_boundaries[0]
+        w_min, w_max = plot_boundaries[1]
+        s_min, s_max = plot_boundaries[2]
+
+    plot_pb = False
+    plot_sf = False
+    if "planetary-boundary" in sunny_boundaries:
+        A_PB = parameters["A_PB"]
+        if "A_max" in parameters:
+            pass # no transformation necessary
+        elif "A_mid" in parameters:
+            A_PB = A_PB / (A_PB + parameters["A_mid"])
+        else:
+            assert False, "couldn't identify how the A axis is scaled"
+        if a_min < A_PB < a_max:
+            plot_pb = True
+    if "social-foundation" in sunny_boundaries:
+        W_SF = parameters["W_SF"]
+        W_SF = W_SF / (W_SF + parameters["W_mid"])
+        if w_min < W_SF < w_max:
+            plot_sf = True
+
+
+    if plot_pb and plot_sf:
+        corner_points_list = [[
+                [A_PB , W_SF , s_min],
+                [A_PB , w_max, s_min],
+                [A_PB , w_max, s_max],
+                [A_PB , W_SF , s_max],
+                ],
+                [
+                [A_PB , W_SF , s_max],
+                [a_min, W_SF, s_max],
+                [a_min, W_SF, s_min],
+                [A_PB , W_SF , s_min],
+                ]]
+    elif plot_pb:
+        corner_points_list = [[[A_PB,w_min,s_min],[A_PB,w_max,s_min],[A_PB,w_max,s_max],[A_PB,w_min,s_max]]]
+    elif plot_sf:
+        corner_points_list = [[[a_min,W_SF,s_min],[a_max,W_SF,s_min],[a_max,W_SF,s_max],[a_min,W_SF,s_max]]]
+    else:
+        raise ValueError("something wrong with sunny_boundaries = {!r}".format(sunny_boundaries))
+
+    boundary_surface_PB = plt3d.art3d.Poly3DCollection(corner_points_list)
+    boundary_surface_PB.set_color("gray")
+    boundary_surface_PB.set_edgecolor("gray")
+    boundary_surface_PB.set_alpha(0.25)
+    ax3d.add_collection3d(boundary_surface_PB)
+
+    # elif boundary == "both":
+        # raise NotImplementedError("will be done soon")
+        # boundary_surface_both = plt3d.art3d.Poly3DCollection([[[0,.5,0],[0,.5,1],[A_PB,.5,1],[A_PB,.5,0]],
+                                                        # [[A_PB,.5,0],[A_PB,1,0],[A_PB,1,1],[A_PB,.5,1]]])
+        # boundary_surface_both.set_color("gray"); boundary_surface_both.set_edgecolor("gray"); boundary_surface_both.set_alpha(0.25)
+        # ax3d.add_collection3d(boundary_surface_both)
+    # else:
+        # raise NameError("Unkown boundary {!r}".format(boundary))
+    # 
+    # if add_outer:
+        # # add outer limits of undesirable view from standard view perspective:
+        # undesirable_outer_stdview = plt3d.art3d.Poly3DCollection([[[0,0,0],[0,0,1],[0,.5,1],[0,.5,0]],
+                                            # [[A_PB,1,0],[aws.A_max,1,0],[aws.A_max,1,1],[A_PB,1,1]],
+                                            # [[0,0,0],[0,.5,0],[A_PB,.5,0],[A_PB,1,0],[aws.A_max,1,0],[aws.A_max,0,0]]])
+        # undesirable_outer_stdview.set_color("gray"); undesirable_outer_stdview.set_edgecolor("gray"); undesirable_outer_stdview.set_alpha(0.25)
+        # ax3d.add_collection3d(undesirable_outer_stdview)
+
+
+def add_segments(ax3d, segments, choices, *, default_color, management_color, **kwargs):
+    """draw 'segments' (shape (n, 2, 3)) as one line collection per color,
+    the ones with choice 0 (i.e. default) in 'default_color', the others in 'management_color'"""
+    choices = np.asarray(choices)
+    for mask, color in [(choices == 0, default_color), (choices != 0, management_color)]:
+        if np.any(mask):
+            ax3d.add_collection3d(plt3d.art3d.Line3DCollection(segments[mask], colors=color, **kwargs))
@@ -4,21 +4,79 @@ from ays_general import __version__, __version_info__
 import ays_general
 import argparse, argcomplete
 
+import multiprocessing as mp
+import os
+import sys
+import time
+
+
+def reformat_file(fname, dry_run=False):
+    """reformat 'fname' if it has an older format, returns (fname, status, size in bytes, seconds, error)
+
+    status is one of 'up-to-date', 'outdated' (dry run only), 'reformatted' or 'failed';
+    the file is replaced atomically by ays_general.save_result_file
+    """
+    start = time.time()
+    try:
+        size = os.path.getsize(fname)
+        if not ays_general.needs_reformat(fname):
+            status = "up-to-date"
+        elif dry_run:
+            status = "outdated"
+        else:
+            ays_general.reformat(fname)
+            status = "reformatted"
+    except Exception as e:
+        return fname, "failed", 0, time.time() - start, "{}: {}".format(type(e).__name__, e)
+    return fname, status, size, time.time() - start, ""
+
+
+def _reformat_job(job):
+    return reformat_file(*job)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="update the format of AWS TSM result files")
     parser.add_argument("files", metavar="file", type=str, nargs="+",
                         help="file with the (presumably) old format")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="only report which files need to be reformatted")
 
     # use argcomplete auto-completion
     argcomplete.autocomplete(parser)
 
     args = parser.parse_args()
 
-    for current_file in args.files:
-
-        ays_general.reformat(current_file, verbose=1)
-
-
+    jobs = [(fname, args.dry_run) for fname in args.files]
+    counts = dict.fromkeys(["up-to-date", "outdated", "reformatted", "failed"], 0)
+    reformatted_bytes = 0
+    start = time.time()
 
+    processes = max(1, min(args.processes, len(jobs)))
+    pool = mp.Pool(processes=processes) if processes > 1 else None
+    try:
+        results = pool.imap_unordered(_reformat_job, jobs) if pool else map(_reformat_job, jobs)
+        for fname, status, size, seconds, error in results:
+            counts[status] += 1
+            if status == "reformatted":
+                reformatted_bytes += size
+            if status == "failed":
+                print("{:12s} {} ({})".format(status, fname, error), flush=True)
+            else:
+                print("{:12s} {} ({:.2f}s)".format(status, fname, seconds), flush=True)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    time_passed = time.time() - start
 
+    print()
+    shown = ["up-to-date", "outdated" if args.dry_run else "reformatted", "failed"]
+    print(", ".join("{} {}".format(counts[status], status) for status in shown))
+    if counts["reformatted"]:
+        print("throughput: {:.2f} files/s, {:.2f} MB/s ({} processes, {:.2f}s)".format(
+            counts["reformatted"] / time_passed, reformatted_bytes / 2**20 / time_passed, processes, time_passed))
+    if counts["failed"]:
+        sys.exit(1)
@@ -2,13 +2,11 @@
 
 from ays_general import __version__, __version_info__
 import ays_model as aws
-import ays_general
-from pyviability import helper
+import ays_general, ays_plotting
 
 import numpy as np
 
 import scipy.integrate as integ
-import scipy.optimize as opt
 
 import matplotlib.pyplot as plt
 import mpl_toolkits.mplot3d as plt3d
@@ -26,9 +24,44 @@ import pickle
 
 import functools as ft
 
+import multiprocessing as mp
+
 DG_BIFURCATION_END = "dg-bifurcation-end"
 DG_BIFURCATION_MIDDLE = "dg-bifurcation-middle"
 RUN_OPTIONS = [aws.DEFAULT_NAME] + list(aws.MANAGEMENTS) + [DG_BIFURCATION_END, DG_BIFURCATION_MIDDLE]
+INTEGRATORS = ["odeint", "rk4"]
+
+
+def _odeint_chunk(job):
+    """integrate a chunk of initial conditions with odeint, one after the other"""
+    aws_0, time, parameter_list = job
+    traj = np.empty((len(aws_0), len(time), 3))
+    for i, x0 in enumerate(aws_0):
+        traj[i] = integ.odeint(aws.AYS_rescaled_rhs, x0, time, args=parameter_list, Dfun=aws.AYS_rescaled_jacobian)
+    return traj
+
+
+def sample_trajectories(aws_0, time, parameter_list, *, integrator="odeint", processes=1, substeps=4):
+    """integrate all initial conditions 'aws_0' of shape (num, 3) and return the trajectories as (num, len(time), 3) array
+
+    'rk4' integrates all of them at once with a fixed step Runge-Kutta method
+    ('substeps' steps between two of the output times), 'odeint' uses the
+    adaptive integrator and distributes the initial conditions over 'processes'
+    worker processes
+    """
+    aws_0 = np.asarray(aws_0, dtype=float)
+    time = np.asarray(time, dtype=float)
+    if integrator == "rk4":
+        return aws.AYS_rescaled_rk4(aws_0, time, substeps, *parameter_list)
+    elif integrator == "odeint":
+        if processes == 1 or len(aws_0) < 2:
+            return _odeint_chunk((aws_0, time, parameter_list))
+        chunks = np.array_split(aws_0, min(len(aws_0), 4 * processes))
+        with mp.Pool(processes) as pool:
+            trajs = pool.map(_odeint_chunk, [(chunk, time, parameter_list) for chunk in chunks])
+        return np.concatenate(trajs, axis=0)
+    raise ValueError("unknown integrator {!r}".format(integrator))
+
 
 if __name__ == "__main__":
 
@@ -48,6 +81,17 @@ if __name__ == "__main__":
     parser.add_argument("-n", "--num", type=int, default=400,
             help="number of initial conditions (default: 400)")
     
+    parser.add_argument("-i", "--integrator", choices=INTEGRATORS, default="odeint",
+                        help="'odeint' (adaptive, one trajectory after the other) or "
+                        "'rk4' (fixed step, all trajectories at once) (default: 'odeint')")
+
+    parser.add_argument("--substeps", type=int, default=4,
+                        help="number of rk4 steps between two output times (default: 4)")
+
+    parser.add_argument("-j", "--processes", type=int, default=1,
+                        help="number of processes for the odeint integration, "
+                        "'0' uses all cpus (default: 1)")
+
     parser.add_argument("--no-boundary", dest="draw_boundary", action="store_false",
                         help="remove the boundary inside the plot")
     
@@ -55,7 +99,7 @@ if __name__ == "__main__":
                         help="save the picture to 'file'")
     
     parser.add_argument("-z", "--zero", action="store_true",
-            help="compute the zero of the RHS in the S=0 plane")
+            help="find the fixed points of the RHS (in the whole cube) and their stability")
 
     # use argcomplete auto-completion
     argcomplete.autocomplete(parser)
@@ -66,6 +110,9 @@ if __name__ == "__main__":
     # small hack for now
     args.options =[args.option]
 
+    if args.processes == 0:
+        args.processes = mp.cpu_count()
+
     num = args.num
     aws_0 = np.random.rand(num,3)  # args.mode == "all"
     if args.mode == "lake":
@@ -82,19 +129,18 @@ if __name__ == "__main__":
         if management == DG_BIFURCATION_END:
             parameter_dict = aws.get_management_parameter_dict("degrowth", aws.AYS_parameters)
             parameter_dict["beta"] = 0.035
+            parameter_list = aws.get_management_parameters(aws.DEFAULT_NAME, parameter_dict, aws.grid_parameters)
         elif management == DG_BIFURCATION_MIDDLE:
             parameter_dict = aws.get_management_parameter_dict("degrowth", aws.AYS_parameters)
             parameter_dict["beta"] = 0.027
+            parameter_list = aws.get_management_parameters(aws.DEFAULT_NAME, parameter_dict, aws.grid_parameters)
         else:
-            parameter_dict = aws.get_management_parameter_dict(management, aws.AYS_parameters)
+            parameter_list = aws.get_management_parameters(management, aws.AYS_parameters, aws.grid_parameters)
         if args.zero:
-            x0 = [0.5, 0.5, 0] # a, w, s
             print("fixed point(s) of {}:".format(management))
-            # below the '0' is for the time t
-            print(opt.fsolve(aws.AYS_rescaled_rhs, x0,
-                             args=(0., ) + helper.get_ordered_parameters(aws._AYS_rhs, parameter_dict)))
+            ays_general.print_equilibria(aws.find_equilibria(parameter_list))
             print()
-        parameter_lists.append(helper.get_ordered_parameters(aws._AYS_rhs, parameter_dict))
+        parameter_lists.append(parameter_list)
     # colors = ["green", "blue", "red"]
     # assert len(parameter_lists) <= len(colors), "need to add colors"
 
@@ -102,16 +148,14 @@ if __name__ == "__main__":
     colortop = "green"
     colorbottom = "black"
 
-    fig, ax3d = ays_general.create_figure(A_mid=aws.A_mid, W_mid=aws.W_mid, S_mid=aws.S_mid)
+    fig, ax3d = ays_plotting.create_figure(A_mid=aws.A_mid, W_mid=aws.W_mid, S_mid=aws.S_mid)
     ax3d.view_init(ays_general.ELEVATION_FLOW, ays_general.AZIMUTH_FLOW)
 
-    for i in range(num):
-        x0 = aws_0[i]
-        # management trajectory with degrowth:
-        for parameter_list in parameter_lists:
-            traj = integ.odeint(aws.AYS_rescaled_rhs, x0, time, args=parameter_list)
-            ax3d.plot3D(xs=traj[:,0], ys=traj[:,1], zs=traj[:,2],
-                        color=colorbottom if traj[-1,2]<0.5 else colortop, alpha=.3)
+    for parameter_list in parameter_lists:
+        trajs = sample_trajectories(aws_0, time, parameter_list, integrator=args.integrator,
+                                    processes=args.processes, substeps=args.substeps)
+        colors = np.where(trajs[:, -1, 2] < 0.5, colorbottom, colortop)
+        ax3d.add_collection3d(plt3d.art3d.Line3DCollection(trajs, colors=colors, alpha=.3))
 
         # below traj was default and traj2 was degrowth
         # if traj2[:,0].max() > aws.A_PB > traj[:,0].max() and traj[-1,2] < 1e10 and traj2[-1,2] > 1e10: # lake candidate!
@@ -124,7 +168,7 @@ if __name__ == "__main__":
 
 
     if args.draw_boundary:
-        ays_general.add_boundary(ax3d,
+        ays_plotting.add_boundary(ax3d,
                                  sunny_boundaries=["planetary-boundary", "social-foundation"],
                                  **aws.grid_parameters, **aws.boundary_parameters)
 
@@ -6,22 +6,428 @@ import ays_general
 import ays_model as ays
 
 import pyviability as viab
-from pyviability import helper
 from pyviability import libviability as lv
 
 import numpy as np
-import scipy.optimize as opt
+import scipy.spatial as spat
 
 import time
 import datetime as dt
+import multiprocessing as mp
 
 import sys, os
+import warnings as warn
+import itertools as it
+import json
 import argparse, argcomplete
 
 MANAGEMENTS = ays.MANAGEMENTS
 
 boundaries_choices = ["planetary-boundary", "social-foundation", "both"]
 
+OUTPUT_FILE_SUFFIX = ".out"
+MANIFEST_SUFFIX = ".manifest"
+
+# parameters that change the grid itself and can hence not be swept over a shared grid
+GRID_CHANGING_PARAMETERS = ["n0", "grid_type", "boundaries"]
+
+# the centers of the 8 children of a cell, in units of the cell size
+REFINEMENT_OFFSETS = np.array(list(it.product([-1, 1], repeat=3))) / 4
+
+
+def make_run_functions(managements, run_args, run_kwargs):
+    """create the default run function and one run function per management option
+
+    the run functions are cached in ays_model (see ays_model.get_management_run),
+    so repeated calls with the same parameters don't rebuild them; the
+    statistics of hybrid run functions are reset
+    """
+    default_run, *management_runs = [
+        ays.get_management_run(m, ays.AYS_parameters, ays.grid_parameters, *run_args, **run_kwargs)
+        for m in [ays.DEFAULT_NAME] + list(managements)]
+    for run in [default_run] + management_runs:
+        if hasattr(run, "statistics"):
+            run.statistics.update(linear=0, integrated=0)
+    return default_run, management_runs
+
+
+def current_topology_step():
+    """the topology step that is running, i.e. the one after the last finished step"""
+    status = viab.get_computation_status()
+    if status in lv.TOPOLOGY_STEP_LIST[:-1]:
+        return lv.TOPOLOGY_STEP_LIST[lv.TOPOLOGY_STEP_LIST.index(status) + 1]
+    # nothing finished yet (or everything from a former run)
+    return lv.TOPOLOGY_STEP_LIST[0]
+
+
+def make_profiled_runs(run_functions, profile):
+    """wrap 'run_functions' to record the time and evaluations per topology step in 'profile'
+
+    pyviability doesn't tell when a step starts, so the step is looked up at
+    each evaluation of a run function; the time in between is counted to
+    the step of the following evaluation
+
+    returns the wrapped run functions and a function that closes the last step
+    """
+    current = {"step": None, "counters": None,
+               "wall": time.perf_counter(), "cpu": time.process_time()}
+
+    def switch_step(step):
+        """close the counters of the running step and continue with 'step' (None to stop)"""
+        wall, cpu = time.perf_counter(), time.process_time()
+        if current["step"] is not None:
+            counters = current["counters"]
+            counters["wall-time"] += wall - current["wall"]
+            counters["cpu-time"] += cpu - current["cpu"]
+            profile["wall-time"] += wall - current["wall"]
+            profile["cpu-time"] += cpu - current["cpu"]
+            counters["peak-rss"] = profile["peak-rss"] = ays_general.peak_rss()
+            current.update(wall=wall, cpu=cpu)
+        # else it's the first step, which includes the setup before its first evaluation
+        current.update(step=step, counters=None if step is None else ays_general.profile_step(profile, step))
+
+    def profiled(run):
+        def profiled_run(*args, **kwargs):
+            step = current_topology_step()
+            if step != current["step"]:
+                switch_step(step)
+            start = time.perf_counter()
+            result = run(*args, **kwargs)
+            counters = current["counters"]
+            counters["evaluations"] += 1
+            counters["evaluation-time"] += time.perf_counter() - start
+            return result
+        return profiled_run
+
+    def finish():
+        if current["step"] is not None:
+            switch_step(None)
+
+    return [profiled(run) for run in run_functions], finish
+
+
+def compute_equilibria(managements):
+    """the fixed points (see ays_model.find_equilibria) of the default and the 'managements' options"""
+    return {m: ays.find_equilibria(ays.get_management_parameters(m, ays.AYS_parameters, ays.grid_parameters))
+            for m in [ays.DEFAULT_NAME] + list(managements)}
+
+
+def run_topology_classification(grid, states, default_run, management_runs, sunny, *,
+                                args, grid_type, out_of_bounds, verbosity, profile=None):
+    """run the TSM computation (unless it's a dry run)
+
+    returns the start time, the time passed and whether the computation ran
+    through (i.e. it wasn't interrupted)
+
+    if 'profile' is given (see ays_general.new_profile), the time and peak
+    memory of the computation are added to it, as well as the fraction of the
+    points the hybrid run functions had to integrate (see
+    ays_model.make_hybrid_run); only with 'args.profile' the run functions
+    are wrapped to split them up into the topology steps and count the
+    evaluations, which costs time at every evaluation
+    """
+    run_functions = [default_run] + management_runs
+    detailed = profile is not None and args.profile
+    if detailed:
+        (default_run, *management_runs), finish_profile = make_profiled_runs([default_run] + management_runs, profile)
+    start_time = time.time()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    print("started: {}".format(dt.datetime.fromtimestamp(start_time).ctime()))
+    print()
+    finished = False
+    if not args.dry_run:
+        try:
+            viab.topology_classification(grid, states, [default_run], management_runs,
+                                            sunny, grid_type=grid_type,
+                                            compute_eddies=args.eddies,
+                                            out_of_bounds=out_of_bounds,
+                                            remember_paths=args.record_paths,
+                                            verbosity=verbosity,
+                                            stop_when_finished=args.stop_when_finished,
+                                            )
+            finished = True
+        except SystemExit as e:
+            print()
+            print("%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%")
+            print("interrupted by SystemExit or Signal {} [{}]".format(ays_general.NUMBER_TO_SIGNAL[e.args[0]], e.args[0]))
+            print("%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%")
+            print()
+    time_passed = time.time() - start_time
+    if detailed:
+        finish_profile()
+    elif profile is not None:
+        profile["wall-time"] += time.perf_counter() - start_wall
+        profile["cpu-time"] += time.process_time() - start_cpu
+        profile["peak-rss"] = ays_general.peak_rss()
+    if profile is not None:
+        integrated_fraction = ays.integrated_fraction(run_functions)
+        if integrated_fraction is not None:
+            profile["integrated-fraction"] = integrated_fraction
+    return start_time, time_passed, finished
+
+
+def make_result(grid, states, *, args, start_time, time_passed,
+                scaling_vector, offset, x_step, out_of_bounds, computation_status=None, grid_levels=None,
+                profile=None, equilibria=None, finished=False):
+    """put together header and data of a result file
+
+    'finished' tells whether the computation ran through, 'grid_levels' are
+    the refinement levels of the points of an adaptive grid, 'profile' the
+    timing of the topology steps (see run_topology_classification) and
+    'equilibria' the fixed points (see compute_equilibria)
+    """
+    if computation_status is None:
+        computation_status = viab.get_computation_status()
+    header = {
+            "aws-version-info": __version_info__,
+            "model": "AWS",
+            "managements": args.managements,
+            "boundaries": args.boundaries,
+            "grid-parameters": ays.grid_parameters,
+            "model-parameters": ays.AYS_parameters,
+            "boundary-parameters": ays.boundary_parameters,
+            "start-time": start_time,
+            "run-time": time_passed,
+            "viab-backscaling-done": args.backscaling,
+            "viab-scaling-vector": scaling_vector,
+            "viab-scaling-offset": offset,
+            "input-args": args,
+            "stepsize": lv.STEPSIZE,
+            "xstep" : x_step,
+            "out-of-bounds": out_of_bounds,
+            "remember-paths": args.record_paths,
+            "computation-status" : computation_status,
+            "profile": profile,
+            "equilibria": equilibria,
+            "finished": finished,
+            }
+    data = {"grid": grid,
+            "states": states,
+            }
+    if grid_levels is not None:
+        data["grid-levels"] = grid_levels
+    if args.record_paths:
+        data["paths"] = lv.PATHS
+        data["paths-lake"] = lv.PATHS_LAKE
+    return header, data
+
+
+def stepsize(x_step, n0):
+    """the step size of the linear approximation / integration for a grid with 'n0' points per dimension"""
+    return 2 * x_step * max([1, np.sqrt( n0 / 80 )])  # prop to 1 / sqrt(n0)
+
+
+def boundary_cells(grid, states, grid_levels, level, cell_size):
+    """mask of the cells of 'level' that have a direct neighbour (of any level) in a different region
+
+    the cells are nested like in an octree, so the center of the same-level
+    neighbour behind each face lies in the cell that actually is there, be it
+    of the same or of a coarser level (finer ones don't exist yet)
+    """
+    dim = grid.shape[-1]
+    indices = np.nonzero(grid_levels == level)[0]
+    regions = np.abs(states[indices])
+    probes = (grid[indices][:, np.newaxis, :] + cell_size * np.concatenate((np.eye(dim), -np.eye(dim)))).reshape(-1, dim)
+    different = np.zeros(len(probes), dtype=bool)
+    probe_regions = np.repeat(regions, 2 * dim)
+    for other_level in range(level + 1):
+        other_indices = np.nonzero(grid_levels == other_level)[0]
+        if not len(other_indices):
+            continue
+        # the probe is inside the cell if it's closer than half the cell size in each coordinate
+        half_size = cell_size * 2**(level - other_level) / 2
+        distances, neighbours = spat.cKDTree(grid[other_indices]).query(probes, p=np.inf,
+                                                                        distance_upper_bound=0.99 * half_size)
+        found = np.isfinite(distances)
+        different[found] |= np.abs(states[other_indices[neighbours[found]]]) != probe_regions[found]
+    mask = np.zeros(len(grid), dtype=bool)
+    mask[indices[np.any(different.reshape(-1, 2 * dim), axis=-1)]] = True
+    return mask
+
+
+def refine_grid(grid, states, grid_levels, mask, cell_size, lower, upper):
+    """replace the cells in 'mask' (of size 'cell_size') by their 8 children
+
+    the children (within 'lower' and 'upper') are unset, all the other points
+    are marked as known already with their negative region number (like the
+    fixed point in infinity), so only the children are classified again
+    """
+    children = (grid[mask][:, np.newaxis, :] + cell_size * REFINEMENT_OFFSETS).reshape(-1, grid.shape[-1])
+    children_levels = np.repeat(grid_levels[mask] + 1, len(REFINEMENT_OFFSETS))
+    inside = np.all((lower <= children) & (children <= upper), axis=-1)
+    new_grid = np.concatenate((grid[~mask], children[inside]))
+    new_states = np.concatenate((-np.abs(states[~mask]), np.zeros(np.count_nonzero(inside), dtype=states.dtype)))
+    new_grid_levels = np.concatenate((grid_levels[~mask], children_levels[inside]))
+    return new_grid, new_states, new_grid_levels
+
+
+def finished_steps(computation_status, finished):
+    """the topology steps that are completed according to 'computation_status'
+
+    an empty status means that everything ran through if the computation is
+    'finished' (see aws-file version 0.8), otherwise that no step is done yet
+    """
+    if computation_status == "":
+        return list(lv.TOPOLOGY_STEP_LIST) if finished else []
+    if computation_status not in lv.TOPOLOGY_STEP_LIST:
+        raise ValueError("unknown topology step {!r}".format(computation_status))
+    return lv.TOPOLOGY_STEP_LIST[:lv.TOPOLOGY_STEP_LIST.index(computation_status) + 1]
+
+
+def seed_states_from_checkpoint(states, checkpoint_states, computation_status, finished):
+    """mark all points that belong to completed steps as known already
+
+    this is done in the same way as the fixed point in infinity is marked as
+    shelter already, i.e. with the negative region number; a completed step
+    that doesn't correspond to a region raises a ValueError, as the points of
+    it couldn't be seeded
+    """
+    steps = finished_steps(computation_status, finished)
+    unknown = [step for step in steps if not hasattr(lv, step)]
+    if unknown:
+        raise ValueError("no region for the topology step(s) {}".format(", ".join(unknown)))
+    regions = [getattr(lv, step) for step in steps]
+    checkpoint_states = np.abs(checkpoint_states)
+    mask = np.isin(checkpoint_states, regions)
+    states[mask] = -checkpoint_states[mask]
+    return np.count_nonzero(mask)
+
+
+def merge_checkpoint_paths(paths, checkpoint_paths):
+    """fill the paths without any info with the ones from the checkpoint"""
+    if not isinstance(paths, dict) or not isinstance(checkpoint_paths, dict):
+        return
+    missing = (np.asarray(paths["next point index"]) == lv.PATHS_INDEX_DEFAULT)
+    for key in paths:
+        paths[key][missing] = checkpoint_paths[key][missing]
+
+
+def make_checkpoint_handler(fname, grid, states, *, args, resumed_run_time, **result_kwargs):
+    """create a signal handler that saves the current state of the computation to 'fname'
+
+    a checkpoint that is due while the previous one is still being saved is
+    skipped, one that fails to save is warned about only
+    """
+    start_time = time.time()
+    def save_checkpoint():
+        time_passed = resumed_run_time + time.time() - start_time
+        saved_grid = grid
+        if args.backscaling:
+            saved_grid = viab.backscaling_grid(np.array(grid), result_kwargs["scaling_vector"], result_kwargs["offset"])
+        header, data = make_result(saved_grid, np.array(states), args=args,
+                                   start_time=start_time, time_passed=time_passed,
+                                   **result_kwargs)
+        print()
+        print("checkpoint after {!s} (finished: {!r})".format(dt.timedelta(seconds=time_passed),
+                                                              header["computation-status"]))
+        try:
+            ays_general.save_result_file(fname, header, data, paths_storage=args.paths_storage, verbose=1)
+        except Exception as e:
+            # a failing checkpoint must not kill the computation it should protect
+            warn.warn("saving the checkpoint to {!r} failed ({}: {}), continuing without it".format(fname, type(e).__name__, e))
+
+    saving = {"running": False}
+    def checkpoint_handler(sig, frame):
+        if saving["running"]:
+            return
+        saving["running"] = True
+        try:
+            save_checkpoint()
+        finally:
+            saving["running"] = False
+    return checkpoint_handler
+
+
+def sweep_output_files(output_file, parameter, num):
+    """the result file names of a parameter sweep with 'num' values, based on 'output_file'"""
+    base = output_file[:-len(OUTPUT_FILE_SUFFIX)] if output_file.endswith(OUTPUT_FILE_SUFFIX) else output_file
+    return ["{}-{}-{:03d}{}".format(base, parameter, i, OUTPUT_FILE_SUFFIX) for i in range(num)], base + MANIFEST_SUFFIX
+
+
+# everything a sweep worker needs; it is set before the process pool is
+# forked, so the (possibly large) grid is shared read-only and not pickled
+_SWEEP_CONTEXT = {}
+
+
+def _sweep_point(job):
+    """compute one point of a parameter sweep (runs inside a worker process)"""
+    index, value, out_file = job
+    context = _SWEEP_CONTEXT
+    args = context["args"]
+    parameter = context["parameter"]
+
+    for d in [ays.AYS_parameters, ays.grid_parameters, ays.boundary_parameters]:
+        if parameter in d:
+            d[parameter] = value
+    if hasattr(ays, parameter):
+        # keep the globalized copy (used by the sunny functions) in sync
+        setattr(ays, parameter, value)
+
+    print("[{}] {} = {!r} --> {}".format(index, parameter, value, out_file), flush=True)
+
+    grid = context["grid"]
+    states = np.array(context["states"])  # every worker needs its own copy
+    default_run, management_runs = make_run_functions(args.managements, context["run_args"], context["run_kwargs"])
+    sunny = viab.scaled_to_one_sunny(ays.AYS_sunny, context["offset"], context["scaling_vector"])
+
+    profile = ays_general.new_profile()
+    start_time, time_passed, finished = run_topology_classification(grid, states, default_run, management_runs, sunny,
+                                                                    args=args,
+                                                                    grid_type=context["grid_type"],
+                                                                    out_of_bounds=context["out_of_bounds"],
+                                                                    verbosity=context["verbosity"],
+                                                                    profile=profile)
+    if args.backscaling:
+        grid = viab.backscaling_grid(grid, context["scaling_vector"], context["offset"])
+
+    header, data = make_result(grid, states, args=args,
+                               start_time=start_time, time_passed=time_passed,
+                               scaling_vector=context["scaling_vector"], offset=context["offset"],
+                               x_step=context["x_step"], out_of_bounds=context["out_of_bounds"],
+                               profile=profile, equilibria=compute_equilibria(args.managements),
+                               finished=finished)
+    if not (args.no_save or args.dry_run):
+        ays_general.save_result_file(out_file, header, data, paths_storage=args.paths_storage, verbose=1)
+    return {
+        "index": index,
+        "value": value,
+        "file": out_file,
+        "run-time": time_passed,
+        "computation-status": header["computation-status"],
+        }
+
+
+def run_sweep(jobs, *, processes, manifest_file, manifest):
+    """compute all 'jobs' in a (forked) process pool and write the manifest"""
+    results = []
+    pool = mp.get_context("fork").Pool(processes=processes)
+    try:
+        for result in pool.imap_unordered(_sweep_point, jobs):
+            results.append(result)
+            print("finished [{}] {} = {!r} after {!s}".format(result["index"], manifest["parameter"], result["value"],
+                                                             dt.timedelta(seconds=result["run-time"])), flush=True)
+        pool.close()
+    except SystemExit as e:
+        print()
+        print("sweep interrupted by SystemExit or Signal {} [{}], writing the manifest of the finished points".format(
+            ays_general.NUMBER_TO_SIGNAL.get(e.args[0], "?"), e.args[0]))
+        pool.terminate()
+    except BaseException as e:
+        # e.g. an exception in a worker, the pool would still be running at the join
+        print()
+        print("sweep failed because of {}: {!s}, writing the manifest of the finished points".format(
+            e.__class__.__name__, e))
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        manifest["results"] = sorted(results, key=lambda r: r["index"])
+        print("saving sweep manifest to {!r} ... ".format(manifest_file), end="", flush=True)
+        with open(manifest_file, "w") as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+        print("done")
+    return manifest
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(
@@ -47,22 +453,59 @@ if __name__ == "__main__":
     parser.add_argument("-i", "--integrate", action="store_const",
                         dest="run_type", const="integration", default="linear",
                         help="integrate instead of using linear approx.")
+    parser.add_argument("--hybrid", action="store_const",
+                        dest="run_type", const="hybrid",
+                        help="use the linear approx. where its estimated error is small enough, "
+                        "integrate elsewhere")
+    parser.add_argument("--hybrid-tolerance", type=float, default=ays.HYBRID_TOLERANCE, metavar="tol",
+                        help="tolerated local error of the linear approx. relative to the stepsize "
+                        "for '--hybrid' (default: {})".format(ays.HYBRID_TOLERANCE))
     parser.add_argument("-n", "--no-save", action="store_true",
                         help="don't save the result")
     parser.add_argument("--num", type=int, default=ays.grid_parameters["n0"],
                         help="number of points per dimension for the grid")
+    parser.add_argument("--coordinates", choices=ays.COORDINATES, default="compactified",
+                        help="coordinates the run functions evolve the points in, 'log' uses "
+                        "(A, log W, log S) and maps the results back to the grid (default: 'compactified')")
+    parser.add_argument("--refine", type=int, default=0, metavar="levels",
+                        help="refine the grid 'levels' times at the boundaries between the regions, "
+                        "each time the cells there are split into 8 and classified again (default: 0)")
     parser.add_argument("-p", "--set-parameter", nargs=2, metavar=("par", "val"),
                         action="append", dest="changed_parameters", default=[],
                         help="set a parameter 'par' to value 'val' "\
                         "(caution, eval is used for the evaluation of 'val'")
+    parser.add_argument("--checkpoint-interval", type=float, default=0, metavar="seconds",
+                        help="save the current state of the computation to 'output-file' every "
+                        "'seconds' seconds, so it can be continued with '--resume' (default: 0, no checkpoints)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time the topology steps and the run function evaluations in each of them, "
+                        "which slows down the computation (by default, only the total time and memory are recorded)")
+    parser.add_argument("--resume", metavar="file",
+                        help="continue the computation saved in 'file' (a checkpoint or an interrupted run), "
+                        "skipping the completed steps")
     parser.add_argument("--record-paths", action="store_true",
                         help="record the paths, direction and default / management option used, "\
                         "so a path can be reconstructed")
+    parser.add_argument("--paths-storage", choices=ays_general.PATHS_STORAGE, default="full",
+                        help="how the recorded paths are saved: 'full' as they are, 'compact' with "
+                        "narrow integer types and compression (lossless), 'quantized' additionally "
+                        "with 16 bit reached points (default: 'full')")
     parser.add_argument("--stop-when-finished", default=lv.TOPOLOGY_STEP_LIST[-1], metavar="computation-step",
                         choices=lv.TOPOLOGY_STEP_LIST,
                         help="stop when the computation of 'computation-step' is finished") 
     parser.add_argument("-z", "--zeros", action="store_true",
-                        help="estimate the fixed point(s)")
+                        help="print the fixed point(s) and their stability (they are saved in any case)")
+
+    # sweep arguments
+    sweep_group = parser.add_argument_group("parameter sweep",
+                                            "compute a series of runs that differ only in one parameter "
+                                            "in a process pool; 'output-file' is used as the base name of "
+                                            "the result files and the manifest")
+    sweep_group.add_argument("--sweep", nargs=4, metavar=("par", "start", "stop", "num"),
+                             help="sweep the parameter 'par' over 'num' values from 'start' to 'stop' "
+                             "(both included, eval is used as for '--set-parameter')")
+    sweep_group.add_argument("-j", "--processes", type=int, default=os.cpu_count(),
+                             help="number of worker processes for '--sweep' (default: number of CPUs)")
 
     # management arguments
     management_group = parser.add_argument_group("management options")
@@ -82,26 +525,75 @@ if __name__ == "__main__":
     # do the actual parsing of the arguments
     args = parser.parse_args()
 
-    OUTPUT_FILE_SUFFIX = ".out"
     if not args.dry_run and not args.output_file.endswith(OUTPUT_FILE_SUFFIX):
         parser.error("please use the suffix '{}' for 'output-file' (reason is actually the '.gitignore' file)".format(OUTPUT_FILE_SUFFIX))
 
+    combined_parameters = dict(ays.AYS_parameters)
+    combined_parameters.update(ays.grid_parameters)
+    combined_parameters.update(ays.boundary_parameters)
+
+    if args.sweep is not None:
+        sweep_parameter = args.sweep[0]
+        if sweep_parameter in GRID_CHANGING_PARAMETERS:
+            parser.error("can't sweep over '{}' because it changes the grid".format(sweep_parameter))
+        if sweep_parameter not in combined_parameters:
+            parser.error("'{}' is an unknown parameter".format(sweep_parameter))
+        if args.zeros:
+            parser.error("'--zeros' can't be combined with '--sweep'")
+        if args.checkpoint_interval > 0:
+            # the checkpoints are saved by the single run only, the workers wouldn't save any
+            parser.error("'--checkpoint-interval' can't be combined with '--sweep'")
+        try:
+            sweep_values = np.linspace(float(eval(args.sweep[1], combined_parameters)),
+                                       float(eval(args.sweep[2], combined_parameters)),
+                                       int(args.sweep[3]))
+        except BaseException as e:
+            parser.error("couldn't evaluate the sweep range {!r} because of {}: {}".format(args.sweep[1:], e.__class__.__name__, str(e)))
+        sweep_files, manifest_file = sweep_output_files(args.output_file, sweep_parameter, len(sweep_values))
+        output_files = sweep_files + [manifest_file]
+    else:
+        output_files = [args.output_file]
+
+    if args.resume is not None:
+        if args.sweep is not None:
+            parser.error("'--resume' can't be combined with '--sweep'")
+        if not os.path.isfile(args.resume):
+            parser.error("can't find the file {!r} to resume from".format(args.resume))
+        if args.resume in output_files:
+            # continuing in the same file is fine
+            output_files.remove(args.resume)
+
+    if args.run_type == "hybrid" and args.coordinates != "compactified":
+        parser.error("'--hybrid' can't be combined with '--coordinates {}'".format(args.coordinates))
+    if args.hybrid_tolerance <= 0:
+        parser.error("'--hybrid-tolerance' needs a positive number")
+
+    if args.refine < 0:
+        parser.error("'--refine' needs a non-negative number of levels")
+    if args.refine:
+        for option, used in [("--sweep", args.sweep is not None), ("--resume", args.resume is not None),
+                             ("--record-paths", args.record_paths), ("--checkpoint-interval", args.checkpoint_interval > 0)]:
+            if used:
+                parser.error("'--refine' can't be combined with '{}' because the grid changes during the computation".format(option))
+
     if not (args.force or args.dry_run):
-        if os.path.isfile(args.output_file):
-            parser.error("'{}' exists already, use '--force' option to overwrite".format(args.output_file))
+        for out_file in output_files:
+            if os.path.isfile(out_file):
+                parser.error("'{}' exists already, use '--force' option to overwrite".format(out_file))
 
     print()
 
     ays.grid_parameters["n0"] = args.num
+    if args.refine:
+        ays.grid_parameters["refinement_levels"] = args.refine
+    if args.coordinates != "compactified":
+        ays.grid_parameters["coordinates"] = args.coordinates
 
     print("managements: {}".format(", ".join(args.managements) if args.managements else "(None)"))
     print()
 
     if args.changed_parameters:
         print("parameter changing:")
-        combined_parameters = dict(ays.AYS_parameters)
-        combined_parameters.update(ays.grid_parameters)
-        combined_parameters.update(ays.boundary_parameters)
         for par, val in args.changed_parameters:
             for d in [ays.AYS_parameters, ays.grid_parameters, ays.boundary_parameters]:
                 if par in d:
@@ -148,7 +640,7 @@ if __name__ == "__main__":
                                                          n0,
                                                          grid_type,
                                                          verbosity=verbosity)
-    lv.STEPSIZE = 2 * x_step * max([1, np.sqrt( n0 / 80 )])  # prop to 1 / sqrt(n0)
+    lv.STEPSIZE = stepsize(x_step, n0)
     print("stepsize / gridstepsize: {:<5.3f}".format(lv.STEPSIZE / x_step))
     print()
 
@@ -158,119 +650,217 @@ if __name__ == "__main__":
     # mark the fixed point in infinity as shelter already
     states[ np.linalg.norm(grid - [0, 1, 1], axis=-1) < 5 * x_step] = -lv.SHELTER
 
+    checkpoint_data = None
+    resumed_run_time = 0
+    skip_computation = False
+    computation_status = None  # i.e. as given by pyviability
+    if args.resume is not None:
+        checkpoint_header, checkpoint_data = ays_general.load_result_file(args.resume, auto_reformat=True, mmap=False, verbose=1)
+        current = {
+            "grid-parameters": ays.grid_parameters,
+            "model-parameters": ays.AYS_parameters,
+            "boundary-parameters": ays.boundary_parameters,
+            "managements": args.managements,
+            "boundaries": args.boundaries,
+            "remember-paths": args.record_paths,
+            }
+        for key in sorted(current):
+            if ays_general.recursive_difference(current[key], checkpoint_header[key]):
+                parser.error("can't resume from {!r}, '{}' differs from the current settings".format(args.resume, key))
+        if checkpoint_data["states"].shape != states.shape:
+            parser.error("can't resume from {!r}, the grids don't fit".format(args.resume))
+        resumed_run_time = checkpoint_header["run-time"]
+        try:
+            done = finished_steps(checkpoint_header["computation-status"], checkpoint_header["finished"])
+        except ValueError as e:
+            parser.error("can't resume from {!r}, {}".format(args.resume, e))
+        print("resuming from {!r}, finished steps: {}".format(args.resume, ", ".join(done) if done else "(None)"))
+        if args.stop_when_finished in done:
+            print("nothing left to compute until '{}'".format(args.stop_when_finished))
+            skip_computation = True
+            computation_status = checkpoint_header["computation-status"]
+            # the negative states are the ones that had been known before the
+            # checkpointed run, their region is final as well
+            num_negative = np.count_nonzero(checkpoint_data["states"] < 0)
+            states[:] = np.abs(checkpoint_data["states"])
+            if num_negative:
+                print("{} points marked as known before are taken as classified".format(num_negative))
+            if not checkpoint_header["finished"]:
+                print("the checkpoint was interrupted after '{}', which is all that's needed, "
+                      "so the result is marked as finished".format(checkpoint_header["computation-status"]))
+        else:
+            try:
+                num_seeded = seed_states_from_checkpoint(states, checkpoint_data["states"],
+                                                         checkpoint_header["computation-status"], checkpoint_header["finished"])
+            except ValueError as e:
+                parser.error("can't resume from {!r}, {}".format(args.resume, e))
+            print("{} of {} points are known from the completed steps".format(num_seeded, states.size))
+        print()
+
     run_args = [offset, scaling_vector]
     run_kwargs = dict(returning=args.run_type)
-
-    default_run = viab.make_run_function(ays.AYS_rescaled_rhs,
-                                         helper.get_ordered_parameters(ays._AYS_rhs, ays.AYS_parameters),
-                                         *run_args, **run_kwargs)
+    if args.run_type == "hybrid":
+        run_kwargs["tolerance"] = args.hybrid_tolerance
+    if args.coordinates != "compactified":
+        run_kwargs["coordinates"] = args.coordinates
 
     print("recording-paths: {}".format(args.record_paths))
     print()
 
-    if args.zeros:
-        x0 = [0.5, 0.5, 0] # a, w, s
-        # x0 = [ays.boundary_parameters["A_PB"], 0.5, 0] # A, w, s
-        # print(x0)
-        print("fixed point(s) of default:")
-        # below the '0' is for the time t
-        print(opt.fsolve(ays.AYS_rescaled_rhs, x0,
-                         args=(0., ) + helper.get_ordered_parameters(ays._AYS_rhs, ays.AYS_parameters)))
+    # out_of_bounds = [[False, True],   # A still has A_max as upper boundary
+                     # [False, False],  # W compactified as w
+                     # [False, False]]  # S compactified as s
+
+    out_of_bounds = False # in a, w, s representation, doesn't go out of bounds of [0, 1)^3 by definition
+
+    if args.sweep is not None:
+        print("sweeping {} over {} values from {!r} to {!r} with {} processes".format(
+            sweep_parameter, len(sweep_values), sweep_values[0], sweep_values[-1], args.processes))
+        for value, out_file in zip(sweep_values, sweep_files):
+            print("{} = {!r} --> {}".format(sweep_parameter, value, out_file))
         print()
 
+        _SWEEP_CONTEXT.update(
+            args=args,
+            parameter=sweep_parameter,
+            grid=grid,
+            states=states,
+            scaling_vector=scaling_vector,
+            offset=offset,
+            x_step=x_step,
+            grid_type=grid_type,
+            out_of_bounds=out_of_bounds,
+            run_args=run_args,
+            run_kwargs=run_kwargs,
+            verbosity=verbosity,
+            )
+        manifest = {
+            "aws-version-info": list(__version_info__),
+            "parameter": sweep_parameter,
+            "values": sweep_values.tolist(),
+            "files": sweep_files,
+            "managements": args.managements,
+            "boundaries": args.boundaries,
+            }
+
+        # not SIGCHLD (alias SIGCLD), it's sent whenever a worker of the pool exits
+        ays_general.register_signals(set(ays_general.ALL_SIGNALS.values()) - {ays_general.ALL_SIGNALS["SIGCHLD"]})
+
+        jobs = [(i, float(value), out_file) for i, (value, out_file) in enumerate(zip(sweep_values, sweep_files))]
+        start_time = time.time()
+        if args.dry_run:
+            print("dry run, not starting the sweep")
+        else:
+            run_sweep(jobs, processes=args.processes, manifest_file=manifest_file, manifest=manifest)
+        print()
+        print("total sweep time: {!s}".format(dt.timedelta(seconds=time.time() - start_time)))
+        sys.exit(0)
 
-    management_runs = []
-    for m in args.managements:
-        management_dict = ays.get_management_parameter_dict(m, ays.AYS_parameters)
-        management_run = viab.make_run_function(ays.AYS_rescaled_rhs,
-                                                helper.get_ordered_parameters(ays._AYS_rhs, management_dict),
-                                                *run_args, **run_kwargs)
-        management_runs.append(management_run)
-        if args.zeros:
+    default_run, management_runs = make_run_functions(args.managements, run_args, run_kwargs)
+
+    equilibria = compute_equilibria(args.managements)
+    if args.zeros:
+        for m, management_equilibria in equilibria.items():
             print("fixed point(s) of {}:".format(m))
-            # below the '0' is for the time t
-            print(opt.fsolve(ays.AYS_rescaled_rhs, x0,
-                             args=(0., ) + helper.get_ordered_parameters(ays._AYS_rhs, management_dict)))
+            ays_general.print_equilibria(management_equilibria)
             print()
 
     sunny = viab.scaled_to_one_sunny(ays.AYS_sunny, offset, scaling_vector)
 
-    # out_of_bounds = [[False, True],   # A still has A_max as upper boundary
-                     # [False, False],  # W compactified as w
-                     # [False, False]]  # S compactified as s
-
-    out_of_bounds = False # in a, w, s representation, doesn't go out of bounds of [0, 1)^3 by definition
-
     ays_general.register_signals()
 
-    start_time = time.time()
-    print("started: {}".format(dt.datetime.fromtimestamp(start_time).ctime()))
-    print()
-    if not args.dry_run:
-        try:
-            viab.topology_classification(grid, states, [default_run], management_runs,
-                                            sunny, grid_type=grid_type,
-                                            compute_eddies=args.eddies,
-                                            out_of_bounds=out_of_bounds,
-                                            remember_paths=args.record_paths,
-                                            verbosity=verbosity,
-                                            stop_when_finished=args.stop_when_finished,
-                                            )
-        except SystemExit as e:
-            print()
-            print("%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%")
-            print("interrupted by SystemExit or Signal {} [{}]".format(ays_general.NUMBER_TO_SIGNAL[e.args[0]], e.args[0]))
-            print("%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%")
+    # the timing of the topology steps (of this run, not the resumed one)
+    profile = None if skip_computation else ays_general.new_profile()
+
+    if args.checkpoint_interval > 0 and not (args.no_save or args.dry_run or skip_computation):
+        print("saving checkpoints every {!s} to {!r}".format(dt.timedelta(seconds=args.checkpoint_interval), args.output_file))
+        print()
+        checkpoint_handler = make_checkpoint_handler(args.output_file, grid, states, args=args,
+                                                     resumed_run_time=resumed_run_time,
+                                                     scaling_vector=scaling_vector, offset=offset,
+                                                     x_step=x_step, out_of_bounds=out_of_bounds,
+                                                     profile=profile, equilibria=equilibria)
+        ays_general.register_periodic_handler(args.checkpoint_interval, checkpoint_handler)
+
+    if skip_computation:
+        # everything up to 'args.stop_when_finished' is done already
+        start_time, time_passed, finished = time.time(), 0, True
+    else:
+        start_time, time_passed, finished = run_topology_classification(grid, states, default_run, management_runs, sunny,
+                                                                        args=args,
+                                                                        grid_type=grid_type,
+                                                                        out_of_bounds=out_of_bounds,
+                                                                        verbosity=verbosity,
+                                                                        profile=profile)
+    ays_general.register_periodic_handler(0, None)  # stop the checkpoints
+
+    grid_levels = None
+    if args.refine:
+        # the cells of the coarse grid have the size x_step and are centered at
+        # the grid points, the refined ones must stay inside of [0, 1]^dim
+        grid_levels = np.zeros(len(grid), dtype=np.uint8)
+        lower, upper = np.zeros(grid.shape[-1]), np.ones(grid.shape[-1])
+        for level in range(args.refine):
+            cell_size = x_step / 2**level
+            mask = boundary_cells(grid, states, grid_levels, level, cell_size)
+            if not np.any(mask):
+                print("no boundary cells left to refine")
+                break
+            grid, states, grid_levels = refine_grid(grid, states, grid_levels, mask, cell_size, lower, upper)
+            lv.STEPSIZE = stepsize(cell_size / 2, n0 * 2**(level + 1))
             print()
-    time_passed = time.time() - start_time
+            print("refinement level {}: {} boundary cells split, {} points now".format(level + 1, np.count_nonzero(mask), len(grid)))
+            print("stepsize / gridstepsize: {:<5.3f}".format(lv.STEPSIZE / (cell_size / 2)))
+            _, level_time_passed, level_finished = run_topology_classification(grid, states, default_run, management_runs, sunny,
+                                                                               args=args,
+                                                                               grid_type=grid_type,
+                                                                               out_of_bounds=out_of_bounds,
+                                                                               verbosity=verbosity,
+                                                                               profile=profile)
+            time_passed += level_time_passed
+            finished = finished and level_finished
+        # the points that have been known before are negative still
+        states = np.abs(states)
 
     print()
     print("run time: {!s}".format(dt.timedelta(seconds=time_passed)))
     print()
+    if profile is not None and profile["integrated-fraction"] is not None:
+        print("points integrated by the hybrid run functions: {:.1%}".format(profile["integrated-fraction"]))
+        print()
+    if profile is not None and verbosity >= 2:
+        ays_general.print_profile(profile)
+        print()
+    time_passed += resumed_run_time
+
+    if checkpoint_data is not None and args.record_paths:
+        if skip_computation:
+            lv.PATHS = checkpoint_data["paths"]
+            lv.PATHS_LAKE = checkpoint_data["paths-lake"]
+        else:
+            merge_checkpoint_paths(lv.PATHS, checkpoint_data["paths"])
+            merge_checkpoint_paths(lv.PATHS_LAKE, checkpoint_data["paths-lake"])
 
     if args.backscaling:
         grid = viab.backscaling_grid(grid, scaling_vector, offset)
 
     viab.print_evaluation(states)
+    if grid_levels is not None:
+        print()
+        print("volumes on the adaptive grid:")
+        volumes = ays_general.region_volumes(states, weights=ays_general.cell_weights(grid_levels, grid.shape[-1]))
+        total = sum(volumes.values())
+        for region, volume in volumes.items():
+            if volume:
+                print("{:<15s} {:7.3%}".format(region, volume / total))
 
     if not args.no_save:
-        header = {
-                "aws-version-info": __version_info__,
-                "model": "AWS",
-                "managements": args.managements,
-                "boundaries": args.boundaries,
-                "grid-parameters": ays.grid_parameters,
-                "model-parameters": ays.AYS_parameters,
-                "boundary-parameters": ays.boundary_parameters,
-                "start-time": start_time,
-                "run-time": time_passed,
-                "viab-backscaling-done": args.backscaling,
-                "viab-scaling-vector": scaling_vector,
-                "viab-scaling-offset": offset,
-                "input-args": args,
-                "stepsize": lv.STEPSIZE,
-                "xstep" : x_step,
-                "out-of-bounds": out_of_bounds,
-                "remember-paths": args.record_paths,
-                "computation-status" : viab.get_computation_status(),
-                }
-        data = {"grid": grid,
-                "states": states,
-                }
-        if args.record_paths:
-            data["paths"] = lv.PATHS
-            data["paths-lake"] = lv.PATHS_LAKE
+        header, data = make_result(grid, states, args=args,
+                                   start_time=start_time, time_passed=time_passed,
+                                   scaling_vector=scaling_vector, offset=offset,
+                                   x_step=x_step, out_of_bounds=out_of_bounds,
+                                   computation_status=computation_status,
+                                   grid_levels=grid_levels,
+                                   profile=profile, equilibria=equilibria, finished=finished)
         if not args.dry_run:
-            ays_general.save_result_file(args.output_file, header, data, verbose=1)
-
-
-
-
-
-
-
-
-
-
-
-
+            ays_general.save_result_file(args.output_file, header, data, paths_storage=args.paths_storage, verbose=1)
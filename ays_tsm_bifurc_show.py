@@ -21,7 +21,7 @@ import matplotlib.pyplot as plt
 from matplotlib import ticker as mticker
 
 
-FILE_ERROR_MESSAGE = "{!r} seems to be an older aws file version or not a proper aws file, please use the '--reformat' option"
+FILE_ERROR_MESSAGE = "couldn't read the input files, maybe not a proper aws file ({!s})"
 
 TRANSLATION = {
         "beta_DG" : r"$\beta_{0,LG}\, \left[\frac{\%}{\mathrm{a}}\right]$",
@@ -41,6 +41,12 @@ if __name__ == "__main__":
     parser.add_argument("-s", "--save-pic", metavar="file", default="",
                         help="save the picture to 'file'")
 
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(),
+                        help="number of processes reading the input files that are not in the summary index yet "
+                        "(default: number of CPUs)")
+    parser.add_argument("--rebuild-index", action="store_true",
+                        help="read all input files again instead of using their summaries from the index")
+
     parser.add_argument("-v", "--verbose", action="count", default=0,
                         help="increase verbosity can be used as -v, -vv ...")
 
@@ -68,36 +74,39 @@ if __name__ == "__main__":
         print("header comparison keys:", cmp_list)
         print()
 
+    # only the summaries (parameters and region volumes) are needed, they are
+    # taken from the summary index and the files are read only if they changed
     try:
-        print("getting reference ... ", end="")
-        reference_header, _ = ays_general.load_result_file(args.input_files[0], verbose=1)
-    except IOError:
-        parser.error(FILE_ERROR_MESSAGE.format(args.input_file))
+        summaries = ays_general.load_summaries(args.input_files, processes=args.processes,
+                                               rebuild_index=args.rebuild_index, verbose=args.verbose)
+    except IOError as e:
+        parser.error(FILE_ERROR_MESSAGE.format(e))
+    print("got the summaries of {} files".format(len(summaries)))
 
     # remove the bifurcation_parameter from the reference and check at the same time that it really was in there
+    reference_header = dict(summaries[0], **{"model-parameters": dict(summaries[0]["model-parameters"])})
     reference_header["model-parameters"].pop(bifurcation_parameter)
 
     # check correct parameters
     bifurcation_parameter_list = []
     volume_lists = {r:[] for r in lv.REGIONS}
-    for in_file in args.input_files:
-        try:
-            header, data = ays_general.load_result_file(in_file, verbose=1)
-        except IOError:
-            parser.error(FILE_ERROR_MESSAGE.format(args.input_file))
+    for in_file, summary in zip(args.input_files, summaries):
+        model_parameters = dict(summary["model-parameters"])
         # append the value of the bifurcation parameter to the list and check at the same time that it really was in there
-        bifurcation_parameter_list.append(header["model-parameters"].pop(bifurcation_parameter))
-        
+        bifurcation_parameter_list.append(model_parameters.pop(bifurcation_parameter))
+        header = dict(summary, **{"model-parameters": model_parameters})
+
         for el in cmp_list:
             if ays_general.recursive_difference(reference_header[el], header[el]):
-                raise ValueError("incompatible headers")
-        grid = np.asarray(data["grid"])
-        states = np.asarray(data["states"])
+                raise ValueError("incompatible headers ({!r} and {!r})".format(args.input_files[0], in_file))
 
-        num_all = states.size
+        volumes = summary["region-volumes"]
+        num_all = sum(volumes.values())
+        if volumes.get(ays_general.UNFINISHED_VOLUME, 0):
+            print("{!r}: {:.1%} of the points are unfinished".format(in_file, volumes[ays_general.UNFINISHED_VOLUME] / num_all))
 
         for r in lv.REGIONS:
-            volume_lists[r].append(np.count_nonzero(states == getattr(lv, r))/num_all)
+            volume_lists[r].append(volumes.get(r, 0)/num_all)
     print()
     if bifurcation_parameter == "beta_DG":
         # multiply with 100 becuase it's shown in %
@@ -5,10 +5,11 @@ import pyviability as viab
 from pyviability import libviability as lv
 
 import ays_model as aws
-import ays_general
+import ays_general, ays_plotting
 
 import scipy.spatial as spat
 import numpy as np
+import numba as nb
 import pickle, argparse, argcomplete
 import sys, os
 import datetime as dt
@@ -38,6 +39,149 @@ regions_dict.update(regions_dict_short)
 regions_arguments = [("all", "a")] + list(zip(map(RegionName2Option, lv.REGIONS), map(ft.partial(RegionName2Option, style="short"), lv.REGIONS)))
 regions_arguments_flattened = sorted([item for sublist in regions_arguments for item in sublist])
 
+
+GRID_TREE_SUFFIX = ".kdtree"
+
+def _load_grid_tree(tree_file, grid, fingerprint):
+    """the KD-tree cached in 'tree_file' if it is intact and belongs to 'grid', None otherwise"""
+    try:
+        with open(tree_file, "rb") as f:
+            tree_fingerprint, tree = pickle.load(f)
+    except Exception as e:
+        # truncated, written by an incompatible scipy version, ...
+        print("couldn't load the KD-tree from {!r} ({}: {!s})".format(tree_file, e.__class__.__name__, e))
+        return None
+    if tree_fingerprint != fingerprint or not isinstance(tree, spat.cKDTree):
+        return None
+    # the fingerprint of the result file may be equal by chance, so compare the points, too
+    if tree.data.shape != grid.shape or not np.array_equal(tree.data, grid):
+        return None
+    return tree
+
+
+def get_grid_tree(fname, grid, *, verbose=0):
+    """return a KD-tree of 'grid', stored next to the result file 'fname' so it is built only once
+
+    a cached tree that can't be loaded or doesn't fit 'grid' is rebuilt
+    """
+    tree_file = fname + GRID_TREE_SUFFIX
+    stat = os.stat(fname)
+    fingerprint = (stat.st_size, stat.st_mtime)
+    grid = np.asarray(grid)
+    if os.path.isfile(tree_file):
+        tree = _load_grid_tree(tree_file, grid, fingerprint)
+        if tree is not None:
+            return tree
+        if verbose:
+            print("{!r} is outdated".format(tree_file))
+    print("building KD-tree of the grid ... ", end="", flush=True)
+    tree = spat.cKDTree(grid)
+    print("done")
+    try:
+        with open(tree_file, "wb") as f:
+            pickle.dump((fingerprint, tree), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except IOError as e:
+        print("couldn't save the KD-tree to {!r} ({}: {!s})".format(tree_file, e.__class__.__name__, e))
+    return tree
+
+def analyze_points(tree, states, points, distance):
+    """find the grid points closer than 'distance' to any of 'points'
+
+    returns the sorted indices of all matched grid points and
+    for each point a dictionary state -> number of matched grid points
+    """
+    neighbours = tree.query_ball_point(points, distance)
+    counts = []
+    for indices in neighbours:
+        matched_states, matched_counts = np.unique(states[np.asarray(indices, dtype=int)], return_counts=True)
+        counts.append(dict(zip(matched_states.tolist(), matched_counts.tolist())))
+    all_indices = np.unique(np.concatenate([np.asarray(indices, dtype=int) for indices in neighbours]))
+    return all_indices, counts
+
+
+###############################################################################
+# a quick and straightforward alpha shape computation is implemented below
+
+@nb.jit
+def nb_dot(x, y):
+    val = 0
+    for x_i, y_i in zip(x, y):
+        val += x_i * y_i
+    return val
+
+@nb.jit
+def nb_cross(x, y):
+    val = np.array([  x[1]*y[2] - x[2]*y[1],
+             x[2]*y[0] - x[0]*y[2],
+             x[0]*y[1] - x[1]*y[0] ])
+    return val
+
+@nb.jit
+def r2_circumsphere_tetrahedron_single(a, b, c, d):
+    ad = a - d
+    bd = b - d
+    cd = c - d
+
+    ad2 = nb_dot(ad, ad)
+    bd2 = nb_dot(bd, bd)
+    cd2 = nb_dot(cd, cd)
+
+    cross_1 = nb_cross(bd, cd)
+    cross_2 = nb_cross(cd, ad)
+    cross_3 = nb_cross(ad, bd)
+
+    q = ad2 * cross_1 + bd2 * cross_2 + cd2 * cross_3
+    p = 2 * np.abs( nb_dot(ad, cross_1) )
+    if p < 1e-10:
+        return np.infty
+    
+    r2 = nb_dot(q, q) / p**2
+
+    return r2
+
+@nb.jit(nopython=True)
+def r2_circumsphere_tetrahedron(a, b, c, d):
+    len_a = len(a)
+    r2 = np.zeros((len_a,))
+    for i in range(len_a):
+        r2[i] = r2_circumsphere_tetrahedron_single(a[i], b[i], c[i], d[i])
+    return r2
+
+# the vertex indices of the 4 faces of a tetrahedron
+TETRAHEDRON_FACES = np.array([(0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)])
+
+def get_single_faces(triangulation):
+    """return the faces that belong to a single tetrahedron of 'triangulation' only, i.e. its boundary
+
+    every face is given with sorted vertex indices
+    """
+    faces = triangulation[:, TETRAHEDRON_FACES].reshape(-1, 3)
+    if not faces.size:
+        return faces
+    faces.sort(axis=1)
+    num_vertices = int(faces.max()) + 1
+    if num_vertices ** 3 < np.iinfo(np.int64).max:
+        # encode each face as a single integer, much faster to sort than rows
+        faces = faces.astype(np.int64)
+        keys = (faces[:, 0] * num_vertices + faces[:, 1]) * num_vertices + faces[:, 2]
+        _, first_indices, counts = np.unique(keys, return_index=True, return_counts=True)
+        return faces[first_indices[counts == 1]]
+    unique_faces, counts = np.unique(faces, axis=0, return_counts=True)
+    return unique_faces[counts == 1]
+
+def alpha_shape(points, alpha_radius):
+    """compute the boundary triangles of the alpha shape of 'points'"""
+    triangulation = spat.Delaunay(points)
+
+    tetrahedrons = points[triangulation.simplices]
+    radii2 = r2_circumsphere_tetrahedron(tetrahedrons[:, 0, :], tetrahedrons[:, 1, :], tetrahedrons[:, 2, :], tetrahedrons[:, 3, :])
+    reduced_triangulation = triangulation.simplices[radii2 < alpha_radius**2]
+    del radii2, triangulation, tetrahedrons
+
+    return get_single_faces(reduced_triangulation)
+
+###############################################################################
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="show the TSM results of the AWS model")
@@ -57,9 +201,11 @@ if __name__ == "__main__":
                                              description="tools for analyzing")
     analyze_group = paths_parser.add_mutually_exclusive_group()
     analyze_group.add_argument("--analyze-transformed", nargs=2, metavar=("point", "distance"),
-                        help="analyze all points, that are closer to 'point' (in (a, w, s)-coordinates) than 'distance'")
+                        help="analyze all points, that are closer to 'point' (in (a, w, s)-coordinates) than 'distance'; "
+                        "'point' can be a list of points or a text file with one point per line, too")
     analyze_group.add_argument("--analyze-original", nargs=2, metavar=("point", "distance"),
-                        help="analyze all points, that are closer to 'point' (in (A, W, S)-coordinates) than 'distance'")
+                        help="analyze all points, that are closer to 'point' (in (A, W, S)-coordinates) than 'distance'; "
+                        "'point' can be a list of points or a text file with one point per line, too")
 
     paths_parser.add_argument("--mark", metavar="color",
                               help="mark the points chosen by analyze as 'color' points")
@@ -83,6 +229,14 @@ if __name__ == "__main__":
                                 help="choose the plotting style from: " + ", ".join(region_plotting_styles))
     regions_parser.add_argument("--alpha", type=float,
                                 help="set the alpha value (opacity) of the plotted points")
+    regions_parser.add_argument("--cache-dir", default=ays_general.DEFAULT_CACHE_DIR,
+                                help="directory for caching the alpha shapes of '--regions-style surface' "
+                                "(default: $AYS_CACHE_DIR or {!r})".format(ays_general.DEFAULT_CACHE_DIR))
+    regions_parser.add_argument("--cache-size", type=float, default=ays_general.DEFAULT_CACHE_SIZE / 2**20, metavar="MB",
+                                help="maximal size of the cache directory, the least recently used "
+                                "entries are removed first (default: %(default)g)")
+    regions_parser.add_argument("--no-cache", action="store_false", dest="use_cache",
+                                help="neither read nor write cached alpha shapes")
 
     parser.add_argument("--paper", action="store_true",
                         help="create the picture for paper style")
@@ -182,7 +336,7 @@ if __name__ == "__main__":
     if args.plot_boundaries is not None:
         args.plot_boundaries = np.array(eval(args.plot_boundaries, combined_parameters))
         if args.plot_boundaries_original is not None:
-            args.plot_boundaries = args.plot_boundaries / (X_mid[:, np.newaxis] + args.plot_boundaries)
+            args.plot_boundaries = ays_general.compactification(args.plot_boundaries, X_mid[:, np.newaxis])
         assert args.plot_boundaries.shape == (3, 2)
         assert np.all(args.plot_boundaries >= 0) and np.all(args.plot_boundaries <= 1)
 
@@ -194,12 +348,16 @@ if __name__ == "__main__":
     else:
         args.analyze = None
     if not args.analyze is None:
-        path_x0 = np.array(eval(args.analyze[0], combined_parameters))
+        if os.path.isfile(args.analyze[0]):
+            path_x0 = np.loadtxt(args.analyze[0], ndmin=2)
+        else:
+            path_x0 = np.array(eval(args.analyze[0], combined_parameters))
         if args.analyze_original is not None:
-            path_x0 = path_x0 / ( X_mid + path_x0 )
+            path_x0 = ays_general.compactification(path_x0, X_mid)
         path_dist = float(eval(args.analyze[1]))
-        assert path_x0.shape == (3,)
+        assert path_x0.shape[-1:] == (3,) and path_x0.ndim in [1, 2]
         assert np.all(path_x0 > 0) and np.all(path_x0 < 1)
+        path_x0 = np.atleast_2d(path_x0)
 
     if args.show_path:
         if not header["remember-paths"]:
@@ -211,6 +369,9 @@ if __name__ == "__main__":
 
     print("date: {}".format(dt.datetime.fromtimestamp(header["start-time"]).ctime()))
     print("duration: {!s}".format(dt.timedelta(seconds=header["run-time"])))
+    if header["profile"]:
+        print()
+        ays_general.print_profile(header["profile"])
     print()
     print("management options: {}".format(", ".join(header["managements"]) if header["managements"] else "(None)"))
     pars = header["model-parameters"]  # just to make it shorter here
@@ -243,10 +404,19 @@ if __name__ == "__main__":
     print("stepsize / gridstepsize: {:<5.3f}".format(header["stepsize"] / header["xstep"]))
     print()
     print("points per dimension: {:4d}".format(header["grid-parameters"]["n0"]))
+    refinement_levels = header["grid-parameters"].get("refinement_levels", 0)
+    if refinement_levels:
+        print("adaptive grid with {} refinement levels (finest resolution like {} points per dimension), {} points".format(
+            refinement_levels, header["grid-parameters"]["n0"] * 2**refinement_levels, len(data["grid"])))
+    if header["grid-parameters"].get("coordinates", "compactified") != "compactified":
+        print("points evolved in {} coordinates".format(header["grid-parameters"]["coordinates"]))
     print()
     print("paths recorded: {}".format(header["remember-paths"]))
     if args.analyze:
-        print("showing for", path_x0, path_dist)
+        if len(path_x0) == 1:
+            print("showing for", path_x0[0], path_dist)
+        else:
+            print("showing for {} points, {}".format(len(path_x0), path_dist))
     print()
 
     ays_general.print_changed_parameters(header["model-parameters"], aws.AYS_parameters, prefix="changed model parameters:")
@@ -271,11 +441,11 @@ if __name__ == "__main__":
             figure_parameters = dict(header["grid-parameters"])
             figure_parameters["boundaries"] = args.plot_boundaries
             figure_parameters["num_a"] = 6
-            fig, ax3d = ays_general.create_figure(transformed_formatters=args.transformed_formatters, **figure_parameters)
+            fig, ax3d = ays_plotting.create_figure(transformed_formatters=args.transformed_formatters, **figure_parameters)
 
             ax_parameters = dict(header["boundary-parameters"])  # make a copy
             ax_parameters.update(header["grid-parameters"])
-            ays_general.add_boundary(ax3d, sunny_boundaries=header["boundaries"], plot_boundaries=args.plot_boundaries, **ax_parameters)
+            ays_plotting.add_boundary(ax3d, sunny_boundaries=header["boundaries"], plot_boundaries=args.plot_boundaries, **ax_parameters)
 
             def isinside(x, bounds):
                 if bounds is None:
@@ -287,7 +457,17 @@ if __name__ == "__main__":
             for region in args.regions:
                 region_num = getattr(lv, region)
                 mask = (states == region_num) &  mask2
-                if args.regions_style == "points":
+                if args.regions_style == "points" and "grid-levels" in data:
+                    # the points of an adaptive grid, smaller markers for the finer cells
+                    grid_levels = np.asarray(data["grid-levels"])
+                    for level in np.unique(grid_levels[mask]):
+                        level_mask = mask & (grid_levels == level)
+                        ax3d.plot3D(xs=grid[:, 0][level_mask], ys=grid[:, 1][level_mask], zs=grid[:, 2][level_mask],
+                                    color=lv.COLORS[region_num],
+                                    alpha=args.alpha,
+                                    linestyle="", marker=".", markersize=30 / 2**level,
+                                    )
+                elif args.regions_style == "points":
                     ax3d.plot3D(xs=grid[:, 0][mask], ys=grid[:, 1][mask], zs=grid[:, 2][mask],
                                 color=lv.COLORS[region_num],
                                 alpha=args.alpha,
@@ -295,119 +475,34 @@ if __name__ == "__main__":
                                 )
                 elif args.regions_style == "surface":
 
-                    ###############################################################################
-                    # a quick and straightforward alpha shape computation is implemented below
-
-                    import numba as nb
-
-                    @nb.jit
-                    def nb_dot(x, y):
-                        val = 0
-                        for x_i, y_i in zip(x, y):
-                            val += x_i * y_i
-                        return val
-
-                    @nb.jit
-                    def nb_cross(x, y):
-                        val = np.array([  x[1]*y[2] - x[2]*y[1],
-                                 x[2]*y[0] - x[0]*y[2],
-                                 x[0]*y[1] - x[1]*y[0] ])
-                        return val
-
-                    @nb.jit
-                    def r2_circumsphere_tetrahedron_single(a, b, c, d):
-                        ad = a - d
-                        bd = b - d
-                        cd = c - d
-
-                        ad2 = nb_dot(ad, ad)
-                        bd2 = nb_dot(bd, bd)
-                        cd2 = nb_dot(cd, cd)
-
-                        cross_1 = nb_cross(bd, cd)
-                        cross_2 = nb_cross(cd, ad)
-                        cross_3 = nb_cross(ad, bd)
-
-                        q = ad2 * cross_1 + bd2 * cross_2 + cd2 * cross_3
-                        p = 2 * np.abs( nb_dot(ad, cross_1) )
-                        if p < 1e-10:
-                            return np.infty
-                        
-                        r2 = nb_dot(q, q) / p**2
-
-                        return r2
-
-                    @nb.jit(nopython=True)
-                    def r2_circumsphere_tetrahedron(a, b, c, d):
-                        len_a = len(a)
-                        r2 = np.zeros((len_a,))
-                        for i in range(len_a):
-                            r2[i] = r2_circumsphere_tetrahedron_single(a[i], b[i], c[i], d[i])
-                        return r2
-
-                    def get_faces(tetrahedron):
-                        faces = np.zeros((4, 3))
-                        for n, (i1, i2, i3) in enumerate([(0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)]):
-                            faces[n] = tetrahedron[i1], tetrahedron[i2], tetrahedron[i3]
-                        return faces
-
-                    def get_single_faces(triangulation):
-                        num_faces_single = 4
-                        num_tetrahedrons = triangulation.shape[0]
-                        num_faces = num_tetrahedrons * num_faces_single
-                        faces = np.zeros((num_faces, 3), np.int_) # 3 is the dimension of the model
-                        mask = np.ones((num_faces,), np.bool_)
-                        for n in range(num_tetrahedrons):
-                            faces[num_faces_single * n: num_faces_single * (n+1)] = get_faces(triangulation[n])
-                        orderlist = ["x{}".format(i) for i in range(faces.shape[1])]
-                        dtype_list = [(el, faces.dtype.str) for el in orderlist]
-                        faces.view(dtype_list).sort(axis=0)
-                        for k in range(num_faces-1):
-                            if mask[k]:
-                                if np.all(faces[k] == faces[k+1]):
-                                    mask[k] = False
-                                    mask[k+1] = False
-                        single_faces = faces[mask]
-                        return single_faces
-
-                    ###############################################################################
-
-
-
                     alpha_radius = 0.05 # this would actually depend on the input resolution but I just hardcoded it, as it's code for the paper
-                    basefilename = os.path.splitext(os.path.split(args.input_file)[-1])[0]
-                    CACHE_FILE = ".{}-region{}-{}.cache".format(basefilename, region_num, lv.REGIONS[region_num])
 
                     mask = (states == region_num) &  mask2
                     region_points = grid[mask]
 
-                    if os.path.exists(CACHE_FILE):
+                    # the alpha shape depends only on the region's points, bounds and the alpha radius
+                    cache_key = ays_general.cache_key(region_points, bounds=args.plot_boundaries, alpha_radius=alpha_radius)
+                    outer_triangulation = None
+                    if args.use_cache:
+                        outer_triangulation = ays_general.load_cached_array(cache_key, cache_dir=args.cache_dir)
+                    if outer_triangulation is not None:
                         if args.verbose:
                             print()
-                            print("found cache file ({}) with an existing alpha shape, loading ... ".format(CACHE_FILE), end="", flush=True)
-                        with open(CACHE_FILE, "rb") as f:
-                            outer_triangulation = pickle.load(f)
-                        if args.verbose:
-                            print("done")
+                            print("found an existing alpha shape in the cache ({})".format(cache_key))
                     else:
                         if args.verbose:
                             print()
                             print("computing alpha shape for {}: {}".format(region_num, lv.REGIONS[region_num]))
-                        triangulation = spat.Delaunay(region_points)
-
-                        tetrahedrons = region_points[triangulation.simplices]
-                        radii2 = r2_circumsphere_tetrahedron(tetrahedrons[:, 0, :], tetrahedrons[:, 1, :], tetrahedrons[:, 2, :], tetrahedrons[:, 3, :])
-                        reduced_triangulation = triangulation.simplices[radii2 < alpha_radius**2]
-                        del radii2, triangulation, tetrahedrons
-
-                        outer_triangulation = get_single_faces(reduced_triangulation)
-                        if args.verbose:
-                            print()
-                            print("saving alpha_shape to cache file ({}) ... ".format(CACHE_FILE), end="", flush=True)
-                        with open(CACHE_FILE, "wb") as f:
-                            pickle.dump(outer_triangulation, f)
-                        if args.verbose:
-                            print("done")
+                        outer_triangulation = alpha_shape(region_points, alpha_radius).astype(np.int32)
+                        if args.use_cache:
+                            if args.verbose:
+                                print()
+                                print("saving alpha_shape to the cache in {!r} ({}) ... ".format(args.cache_dir, cache_key), end="", flush=True)
+                            ays_general.save_cached_array(cache_key, outer_triangulation,
+                                                          cache_dir=args.cache_dir,
+                                                          max_size=int(args.cache_size * 2**20))
+                            if args.verbose:
+                                print("done")
 
                     if args.verbose:
                         print()
@@ -431,13 +526,21 @@ if __name__ == "__main__":
                     raise NotImplementedError("plotting style '{}' is not yet implemented".format(args.regions_style))
         if args.analyze:
             bounds = args.plot_boundaries
+            grid_tree = get_grid_tree(args.input_file, grid, verbose=args.verbose)
             print("compute indices of points that are to be analyzed ... ", end="", flush=True)
-            diff = grid - path_x0
-            mask = (np.linalg.norm(diff, axis=-1) <= path_dist)
-            starting_indices = np.where(mask)[0].tolist()
+            matched_indices, matched_counts = analyze_points(grid_tree, states, path_x0, path_dist)
+            mask = np.zeros(states.shape, dtype=bool)
+            mask[matched_indices] = True
+            starting_indices = matched_indices.tolist()
             _starting_indices = list(starting_indices)
             print("done")
             print()
+            if len(path_x0) > 1:
+                print("matched per point:")
+                print("POINT : STATE:COUNT ...")
+                for x0, counts in zip(path_x0, matched_counts):
+                    print("{} : {}".format(x0, " ".join("{:>2}:{:<5}".format(s, c) for s, c in sorted(counts.items())) or "-"))
+                print()
             if not starting_indices:
                 print("your point and distance do not match any grid points")
             else:
@@ -448,8 +551,8 @@ if __name__ == "__main__":
                 for s in matched_states:
                     print("{:>5} : {:>5}".format(s, np.count_nonzero(_matched_states == s)))
                     if args.verbose >= 2 and not args.show_path:
-                        for y in grid[mask][_matched_states == s]:
-                            x = X_mid * y / (1 - y)
+                        matched_points = grid[mask][_matched_states == s]
+                        for y, x in zip(matched_points, ays_general.inv_compactification(matched_points, X_mid)):
                             print(y, "<==>" ,x)
                         print()
                 if args.mark is not None:
@@ -464,39 +567,41 @@ if __name__ == "__main__":
                                 alpha=args.mark_alpha)
                 print()
                 if args.show_path:
-                    plotting = lambda traj, choice: ax3d.plot3D(xs=traj[0], ys=traj[1], zs=traj[2],
-                                                                color="lightblue" if choice == 0 else "black")
                     paths_outside = args.paths_outside
                     if paths_outside or bounds is None:
-                        path_isinside = ays_general.dummy_isinside
+                        path_isinside = None
                     else:
-                        def path_isinside(x):
-                            return np.all((bounds[:, 0] <= x) & ( x <= bounds[:, 1]))
-                    ays_general.follow_indices(starting_indices,
-                                               grid=grid,
-                                               states=states,
-                                               paths=data["paths"],
-                                               trajectory_hook=plotting,
-                                               verbose=args.verbose,
-                                               isinside=path_isinside)
+                        def path_isinside(segments):
+                            return np.all((bounds[:, 0] <= segments) & ( segments <= bounds[:, 1]), axis=(-2, -1))
 
-                    if lv.LAKE in matched_states:
-                        if args.verbose < 2:
-                            print("following lake inside of manageable region ...", end="", flush=True)
-                        else:
+                    def follow_and_plot(starting_indices, paths, fallback_paths=None, **colors):
+                        if args.verbose:
+                            print("starting points and states for paths:")
+                            for ind in starting_indices:
+                                print("{!s} --- {:>2}".format(grid[ind], states[ind]))
+                            print()
+                        print("following and plotting paths ... ", end="", flush=True)
+                        indices, segments, choices = ays_general.follow_indices_bulk(starting_indices,
+                                                                                     grid=grid,
+                                                                                     paths=paths,
+                                                                                     fallback_paths=fallback_paths,
+                                                                                     isinside=path_isinside)
+                        ays_plotting.add_segments(ax3d, segments, choices, **colors)
+                        print("done ({} segments)".format(len(indices)))
+                        if args.verbose >= 2:
+                            for ind, (x0, x1), choice in zip(indices, segments, choices):
+                                print("({}| {:>2d}) {} via {} (choice {})".format(ind, states[ind], x0, x1, choice))
                             print()
-                            print("following LAKE points inside of manageable region")
+
+                    follow_and_plot(starting_indices, data["paths"],
+                                    default_color="lightblue", management_color="black")
+
+                    if lv.LAKE in matched_states:
+                        print("following LAKE points inside of manageable region")
                         starting_indices = [index for index in _starting_indices if states[index] == lv.LAKE]
-                        plotting = lambda traj, choice: ax3d.plot3D(xs=traj[0], ys=traj[1], zs=traj[2],
-                                                                    color="green" if choice == 0 else "brown")
-                        ays_general.follow_indices(starting_indices,
-                                                   grid=grid,
-                                                   states=states,
-                                                   paths=data["paths-lake"],
-                                                   fallback_paths=data["paths"] if args.paths_lake_fallback else None,
-                                                   trajectory_hook=plotting,
-                                                   verbose=args.verbose,
-                                                   isinside=path_isinside)
+                        follow_and_plot(starting_indices, data["paths-lake"],
+                                        fallback_paths=data["paths"] if args.paths_lake_fallback else None,
+                                        default_color="green", management_color="brown")
 
         if args.save_pic:
             print("saving to {} ... ".format(args.save_pic), end="", flush=True)